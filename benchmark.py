@@ -0,0 +1,253 @@
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from checked import CheckedStore
+from contacts import ContactCache
+from log import LOG_WRITER
+from phone import normalize_phone
+from pipeline import OrderPipeline
+from preflight import WHATSAPP_SESSION_DIRS
+from standin import StandinServer
+from tracing import TRACER, stage_percentiles
+from whatsapp import Whatsapp
+from whatsmenu import Whatsmenu
+
+# Limite para os dois navegadores ficarem prontos
+STARTUP_TIMEOUT = 60
+# Limite para um lote de pedidos ser atendido
+DRAIN_TIMEOUT = 300
+
+MSG_TITLE = 'Hamburgueria de Teste'
+AUTOMATIC_MSG = ('Olá! Recebemos o seu pedido.\n'
+                 'Avisaremos quando ele sair para entrega.')
+
+
+def prepare_profiles(directory: Path) -> tuple[Path, Path]:
+    """
+    Perfis temporários do WhatsApp e do Whatsmenu. O do WhatsApp ganha a
+    pasta da sessão para a verificação de login tratá-lo como um perfil
+    já usado e os dois navegadores abrirem em headless.
+    """
+    whatsapp = directory / 'profile_whatsapp' / 'wpp'
+    whatsmenu = directory / 'profile_whatsmenu' / 'whatsmenu'
+    for folder in WHATSAPP_SESSION_DIRS:
+        (whatsapp / folder).mkdir(parents=True)
+    whatsmenu.mkdir(parents=True)
+    return whatsapp, whatsmenu
+
+
+class Benchmark:
+    """
+    Atende lotes de pedidos de ponta a ponta sem tocar em clientes reais:
+    o StandinServer faz o papel do painel e do WhatsApp Web, e o Whatsmenu
+    e o Whatsapp apontam para ele, com perfis, sessão, log, registro de
+    atendidos e traces em uma pasta temporária.
+    """
+
+    def __init__(self, directory: Path, delay: float = 0.1,
+                 invalid: float = 0.05, ordered: float = 0.2,
+                 record_commands: bool = False, **options):
+        self.directory = directory
+        self.invalid = invalid
+        self.ordered = ordered
+        self.options = options
+        self.traces_path = directory / 'traces.jsonl'
+
+        payload = directory / 'requests.json'
+        payload.write_text('{"data": []}', encoding='utf8')
+        self.server = StandinServer(payload_path=payload)
+        self.server.whatsapp_delay = delay
+
+        LOG_WRITER.path = directory / 'log.txt'
+        TRACER.path = self.traces_path
+        whatsapp_profile, whatsmenu_profile = prepare_profiles(directory)
+        self.chat = Whatsapp(
+            MSG_TITLE, AUTOMATIC_MSG,
+            open_mode=options.get('open_mode', 'link'),
+            send_mode=options.get('send_mode', 'bulk'),
+            record_commands=record_commands,
+            base_url=f'{self.server.url}/whatsapp',
+            profile=whatsapp_profile,
+            contacts=ContactCache(directory / 'contacts_journal.txt'))
+        self.whatsmenu = Whatsmenu(
+            self.chat, False, '0',
+            extraction=options.get('extraction', 'script'),
+            detection=options.get('detection', 'push'),
+            base_url=self.server.url, record_commands=record_commands,
+            profile=whatsmenu_profile,
+            session_path=directory / 'session.json',
+            checked=CheckedStore(directory / 'checked_journal.txt'))
+        self.pipeline = None
+        self.bursts: list[dict] = []
+
+    def start(self) -> float:
+        """
+        Sobe o servidor e os dois navegadores, como o BrowserThread.
+        Retorna quanto tempo levou.
+        """
+        start = time.perf_counter()
+        self.server.start()
+        self.pipeline = OrderPipeline(self.chat, self.whatsmenu)
+        self.pipeline.start()
+        self.chat.start()
+        if not (self.chat.ready.is_set() and
+                self.whatsmenu.ready.wait(STARTUP_TIMEOUT)):
+            raise RuntimeError('browsers not ready')
+        return time.perf_counter() - start
+
+    def burst(self, count: int) -> dict:
+        """
+        Coloca count pedidos no painel de uma vez e espera todos serem
+        atendidos
+        """
+        phones = [f'55859{random.randint(0, 99999999):08}'
+                  for _ in range(count)]
+        for phone in phones:
+            chance = random.random()
+            if chance < self.invalid:
+                self.server.set_contact(phone, on_whatsapp=False)
+            elif chance < self.invalid + self.ordered:
+                self.server.set_contact(phone, ordered_today=True)
+        pending = {normalize_phone(phone) for phone in phones}
+
+        start = time.perf_counter()
+        self.server.add_orders(count, phones)
+        deadline = start + DRAIN_TIMEOUT
+        # Se o scanner parar, o lote não termina: não espera o limite todo
+        while (pending and time.perf_counter() < deadline
+               and self.pipeline.is_alive()):
+            pending = {phone for phone in pending
+                       if phone not in self.whatsmenu.checked}
+            time.sleep(0.05)
+        drain = time.perf_counter() - start
+
+        done = count - len(pending)
+        result = {'orders': count, 'done': done,
+                  'drain_seconds': round(drain, 3),
+                  'orders_per_minute': round(done / drain * 60, 1)}
+        self.bursts.append(result)
+        return result
+
+    def results(self) -> dict:
+        done = sum(burst['done'] for burst in self.bursts)
+        drain = sum(burst['drain_seconds'] for burst in self.bursts)
+        outcomes, stages = stage_percentiles(self.traces_path)
+        return {
+            'options': self.options,
+            'orders': sum(burst['orders'] for burst in self.bursts),
+            'done': done,
+            'drain_seconds': round(drain, 3),
+            'orders_per_minute': round(done / drain * 60, 1) if drain else 0,
+            'bursts': self.bursts,
+            'outcomes': outcomes,
+            'stages': stages,
+        }
+
+    def stop(self) -> None:
+        if self.pipeline is not None:
+            self.pipeline.stop()
+            self.pipeline.join(10)
+        self.chat.close()
+        self.whatsmenu.close()
+        self.chat.drivers.discard(self.chat.profile, wait=True)
+        self.whatsmenu.drivers.discard(self.whatsmenu.profile, wait=True)
+        LOG_WRITER.close()
+        self.server.stop()
+
+
+def report(results: dict, baseline: Optional[dict] = None) -> str:
+    """
+    Pedidos por minuto, tempo para esvaziar cada lote e p50/p95 de cada
+    etapa; com baseline, a variação de cada número
+    """
+    def line(name: str, value: float, base: Optional[float],
+             unit: str = 's') -> str:
+        text = f'{name:<20} {value:>9.2f}{unit}'
+        if base:
+            text += f'  (base {base:.2f}{unit}, {value / base - 1:+.0%})'
+        return text
+
+    base = baseline or {}
+    outcomes = ', '.join(f'{outcome}={count}' for outcome, count
+                         in sorted(results['outcomes'].items()))
+    lines = [f'{results["done"]}/{results["orders"]} pedidos atendidos '
+             f'({outcomes})']
+    for i, burst in enumerate(results['bursts'], 1):
+        lines.append(f'lote {i}: {burst["done"]}/{burst["orders"]} em '
+                     f'{burst["drain_seconds"]:.1f}s '
+                     f'({burst["orders_per_minute"]:.1f} pedidos/min)')
+    lines.append(line('pedidos/min', results['orders_per_minute'],
+                      base.get('orders_per_minute'), ''))
+    lines.append(line('esvaziar os lotes', results['drain_seconds'],
+                      base.get('drain_seconds')))
+    for stage, stat in results['stages'].items():
+        base_stat = base.get('stages', {}).get(stage, {})
+        for p in ('p50', 'p95'):
+            lines.append(line(f'{stage} {p}', stat[p], base_stat.get(p)))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark de ponta a ponta com o painel e o WhatsApp '
+                    'de teste do standin.py (Chrome em headless)')
+    parser.add_argument('--orders', type=int, default=20,
+                        help='pedidos por lote (20)')
+    parser.add_argument('--bursts', type=int, default=3,
+                        help='quantidade de lotes (3)')
+    parser.add_argument('--delay', type=float, default=0.1,
+                        help='demora do WhatsApp de teste em segundos (0.1)')
+    parser.add_argument('--invalid', type=float, default=0.05,
+                        help='fração de números sem WhatsApp (0.05)')
+    parser.add_argument('--ordered', type=float, default=0.2,
+                        help='fração com o código do pedido hoje (0.2)')
+    parser.add_argument('--open-mode', default='link',
+                        choices=['link', 'search'])
+    parser.add_argument('--send-mode', default='bulk',
+                        choices=['bulk', 'lines'])
+    parser.add_argument('--extraction', default='script',
+                        choices=['script', 'elements', 'network'])
+    parser.add_argument('--detection', default='push',
+                        choices=['push', 'poll'])
+    parser.add_argument('--commands', action='store_true',
+                        help='mede cada comando do WebDriver')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--save', type=Path,
+                        help='grava o resultado em JSON')
+    parser.add_argument('--baseline', type=Path,
+                        help='resultado gravado antes para comparar')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    baseline = None
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding='utf8'))
+
+    # O Chrome pode demorar a soltar os arquivos do perfil
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as directory:
+        benchmark = Benchmark(
+            Path(directory), delay=args.delay, invalid=args.invalid,
+            ordered=args.ordered, record_commands=args.commands,
+            open_mode=args.open_mode, send_mode=args.send_mode,
+            extraction=args.extraction, detection=args.detection)
+        try:
+            print(f'Navegadores prontos em {benchmark.start():.1f}s')
+            for i in range(args.bursts):
+                result = benchmark.burst(args.orders)
+                print(f'lote {i + 1}: {result["done"]}/{args.orders} em '
+                      f'{result["drain_seconds"]:.1f}s')
+            results = benchmark.results()
+            if args.commands:
+                print(f'WhatsApp {benchmark.chat.commands.summary()}')
+                print(f'Whatsmenu {benchmark.whatsmenu.commands.summary()}')
+        finally:
+            benchmark.stop()
+
+    print(report(results, baseline))
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2), encoding='utf8')
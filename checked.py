@@ -0,0 +1,195 @@
+import datetime
+import os
+import threading
+import time
+
+from utils import CHECKED_JOURNAL_PATH, ROOT_DIR
+
+# O journal é gravado em disco (fsync) a cada FSYNC_EVERY números ou
+# FSYNC_SECONDS segundos, o que vier primeiro. Numa queda de energia
+# perde-se no máximo esse lote, o que só causaria uma mensagem repetida.
+FSYNC_EVERY = 20
+FSYNC_SECONDS = 2.0
+
+LEGACY_CHECKED_PATH = ROOT_DIR / 'list_checked.txt'
+
+
+class CheckedStore:
+    """
+    Números já atendidos no dia. A consulta é feita em memória (hash) e
+    cada número novo é acrescentado a um journal em disco
+    (timestamp<TAB>número), que é relido ao abrir. Cada registro vale até a
+    meia-noite do dia em que foi feito; a virada do dia é verificada a cada
+    consulta, então funciona mesmo com o programa aberto a noite toda.
+    """
+
+    def __init__(self, path=CHECKED_JOURNAL_PATH, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self.lock = threading.Lock()
+        self._numbers: dict[str, float] = {}
+        self._pending = 0
+        self._last_sync = clock()
+        self._day = self._today()
+        self._file = None
+        self._load()
+
+    def __contains__(self, phone_number: str) -> bool:
+        with self.lock:
+            self._maintain()
+            return phone_number in self._numbers
+
+    def __len__(self) -> int:
+        with self.lock:
+            self._maintain()
+            return len(self._numbers)
+
+    def add(self, phone_number: str) -> None:
+        with self.lock:
+            self._maintain()
+            if phone_number in self._numbers:
+                return
+            now = self.clock()
+            self._numbers[phone_number] = now
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf8')
+            self._file.write(f'{now:.0f}\t{phone_number}\n')
+            self._pending += 1
+            if self._pending >= FSYNC_EVERY:
+                self._sync()
+
+    def flush(self) -> None:
+        with self.lock:
+            self._sync()
+
+    def close(self) -> None:
+        with self.lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def _today(self) -> datetime.date:
+        return datetime.date.fromtimestamp(self.clock())
+
+    def _maintain(self) -> None:
+        if self._today() != self._day:
+            # Virou o dia: os registros de ontem expiram
+            self._day = self._today()
+            self._numbers.clear()
+            self._rewrite()
+        elif self._pending and self.clock() - self._last_sync >= FSYNC_SECONDS:
+            self._sync()
+
+    def _sync(self) -> None:
+        if self._file is None or not self._pending:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = self.clock()
+
+    def _load(self) -> None:
+        stale = False
+        try:
+            with open(self.path, 'r', encoding='utf8') as file:
+                for line in file:
+                    timestamp, _, phone_number = line.strip().partition('\t')
+                    try:
+                        day = datetime.date.fromtimestamp(float(timestamp))
+                    except ValueError:
+                        # Linha incompleta de uma gravação interrompida
+                        stale = True
+                        continue
+                    if day == self._day and phone_number:
+                        self._numbers[phone_number] = float(timestamp)
+                    else:
+                        stale = True
+        except FileNotFoundError:
+            self._import_legacy()
+            stale = True
+
+        if stale:
+            self._rewrite()
+        else:
+            self._file = open(self.path, 'a', encoding='utf8')
+
+    def _import_legacy(self) -> None:
+        """
+        Aproveita o list_checked.txt antigo se ele for de hoje
+        """
+        try:
+            with open(LEGACY_CHECKED_PATH, 'r', encoding='utf8') as file:
+                lines = [line.strip() for line in file if line.strip()]
+        except OSError:
+            return
+        if lines and lines[0] == self._day.strftime('%d/%m/%Y'):
+            now = self.clock()
+            for phone_number in lines[1:]:
+                self._numbers[phone_number] = now
+
+    def _rewrite(self) -> None:
+        """
+        Regrava o journal só com os registros válidos
+        """
+        if self._file is not None:
+            self._file.close()
+        temp_path = self.path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf8') as file:
+            for phone_number, timestamp in self._numbers.items():
+                file.write(f'{timestamp:.0f}\t{phone_number}\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        self._file = open(self.path, 'a', encoding='utf8')
+        self._pending = 0
+
+
+if __name__ == '__main__':
+    import tempfile
+    from pathlib import Path
+
+    count = 100_000
+    numbers = [f'859{i:08}' for i in range(count)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacy_path = Path(directory) / 'list_checked.txt'
+        list_of_checked = []
+        start = time.perf_counter()
+        for phone_number in numbers:
+            list_of_checked.append(phone_number)
+            with open(legacy_path, 'a', encoding='utf8') as file:
+                file.write(f'{phone_number}\n')
+        legacy_append = time.perf_counter() - start
+
+        lookups = numbers[::1000]
+        start = time.perf_counter()
+        for phone_number in lookups:
+            phone_number in list_of_checked
+        legacy_lookup = (time.perf_counter() - start) / len(lookups)
+
+        store = CheckedStore(Path(directory) / 'checked.txt')
+        start = time.perf_counter()
+        for phone_number in numbers:
+            store.add(phone_number)
+        store.flush()
+        store_append = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for phone_number in lookups:
+            phone_number in store
+        store_lookup = (time.perf_counter() - start) / len(lookups)
+        store.close()
+
+        start = time.perf_counter()
+        reopened = CheckedStore(Path(directory) / 'checked.txt')
+        store_load = time.perf_counter() - start
+        assert len(reopened) == count
+        reopened.close()
+
+    print(f'{count} números')
+    print(f'arquivo antigo: append {legacy_append / count * 1e6:.1f} us, '
+          f'consulta {legacy_lookup * 1e6:.1f} us')
+    print(f'journal: append {store_append / count * 1e6:.1f} us, '
+          f'consulta {store_lookup * 1e6:.1f} us, '
+          f'abertura {store_load * 1000:.0f} ms')
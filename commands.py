@@ -0,0 +1,168 @@
+import heapq
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from utils import ROOT_DIR
+
+# Quantos comandos entram no relatório dos mais lentos e das etapas que
+# mais gastam tempo
+TOP_COMMANDS = 10
+# Funções que só repassam a chamada; o comando fica com quem as chamou
+PASS_THROUGH = frozenset({'_wait_until', '_find', 'find'})
+
+_ROOT = str(ROOT_DIR) + os.sep
+_THIS_FILE = os.path.abspath(__file__)
+
+
+def calling_stage() -> str:
+    """
+    Função do projeto que disparou o comando (modulo.funcao), ignorando
+    o Selenium, lambdas e as funções de PASS_THROUGH
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        code = frame.f_code
+        path = code.co_filename
+        if (path.startswith(_ROOT) and path != _THIS_FILE
+                and 'site-packages' not in path
+                and not code.co_name.startswith('<')
+                and code.co_name not in PASS_THROUGH):
+            module = os.path.splitext(os.path.basename(path))[0]
+            return f'{module}.{code.co_name}'
+        frame = frame.f_back
+    return 'other'
+
+
+class CommandScope:
+    """
+    Comandos de um pedido ou de uma leitura do painel
+    """
+
+    def __init__(self, kind: str, label: str = ''):
+        self.kind = kind
+        self.label = label
+        self.count = 0
+        self.seconds = 0.0
+
+    def __str__(self) -> str:
+        return f'{self.count} commands in {self.seconds:.2f}s'
+
+
+class CommandRecorder:
+    """
+    Mede cada comando enviado ao chromedriver (nome, duração e a etapa
+    que o chamou). Os comandos são somados por etapa e por escopo: cada
+    pedido (Whatsapp.check_number) e cada leitura do painel (Whatsmenu)
+    é um escopo, com o total de comandos e de tempo. Os mais lentos de
+    dentro dos escopos vão para o relatório; os de fora (abrir a página,
+    login, a espera longa do modo push) só entram nos totais.
+    """
+
+    def __init__(self, top: int = TOP_COMMANDS):
+        self.top = top
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.count = 0
+        self.seconds = 0.0
+        # (etapa, comando) -> [quantidade, total]
+        self.stages: dict[tuple[str, str], list] = {}
+        # tipo de escopo -> [quantidade, comandos, total, máximo de
+        # comandos, maior tempo]
+        self.scopes: dict[str, list] = {}
+        # heap com os mais lentos: (segundos, comando, etapa, escopo)
+        self.slowest: list[tuple[float, str, str, str]] = []
+
+    def record(self, command: str, seconds: float) -> None:
+        stage = calling_stage()
+        scope = getattr(self.local, 'scope', None)
+        with self.lock:
+            self.count += 1
+            self.seconds += seconds
+            stat = self.stages.setdefault((stage, command), [0, 0.0])
+            stat[0] += 1
+            stat[1] += seconds
+            if scope is None:
+                return
+            scope.count += 1
+            scope.seconds += seconds
+            item = (seconds, command, stage,
+                    f'{scope.kind} {scope.label}'.strip())
+            if len(self.slowest) < self.top:
+                heapq.heappush(self.slowest, item)
+            elif item > self.slowest[0]:
+                heapq.heapreplace(self.slowest, item)
+
+    @contextmanager
+    def scope(self, kind: str, label: str = ''):
+        """
+        Soma em um CommandScope os comandos desta thread até o fim do
+        bloco
+        """
+        scope = CommandScope(kind, label)
+        previous = getattr(self.local, 'scope', None)
+        self.local.scope = scope
+        try:
+            yield scope
+        finally:
+            self.local.scope = previous
+            with self.lock:
+                stat = self.scopes.setdefault(kind, [0, 0, 0.0, 0, 0.0])
+                stat[0] += 1
+                stat[1] += scope.count
+                stat[2] += scope.seconds
+                stat[3] = max(stat[3], scope.count)
+                stat[4] = max(stat[4], scope.seconds)
+
+    def summary(self) -> str:
+        with self.lock:
+            lines = [f'commands: {self.count} in {self.seconds:.2f}s']
+            for kind, (n, count, seconds, max_count, max_seconds) in sorted(
+                    self.scopes.items()):
+                lines.append(
+                    f'per {kind}: n={n} commands avg={count / n:.1f} '
+                    f'max={max_count} time avg={seconds / n:.3f}s '
+                    f'max={max_seconds:.3f}s')
+            if self.slowest:
+                lines.append(f'slowest {len(self.slowest)}:')
+                lines.extend(
+                    f'  {seconds:.3f}s {command} {stage} ({scope})'
+                    for seconds, command, stage, scope in sorted(
+                        self.slowest, reverse=True))
+            stages = sorted(self.stages.items(), key=lambda item: -item[1][1])
+            if stages:
+                lines.append(f'top {min(self.top, len(stages))} by total:')
+                lines.extend(
+                    f'  {stage} {command}: n={n} total={total:.3f}s '
+                    f'avg={total / n:.3f}s'
+                    for (stage, command), (n, total) in stages[:self.top])
+        return '\n'.join(lines)
+
+
+def instrument(driver, recorder: Optional[CommandRecorder]) -> None:
+    """
+    Passa os comandos do driver pelo recorder (None desliga). Todo
+    comando do Selenium, inclusive os de WebElement e das esperas, passa
+    por driver.execute; o driver é reaproveitado pelo DRIVERS, então a
+    troca é feita uma vez só e o recorder pode ser trocado depois.
+    """
+    if getattr(driver, 'untimed_execute', None) is None:
+        execute = driver.execute
+
+        def timed_execute(driver_command, params=None):
+            current = driver.command_recorder
+            if current is None:
+                return execute(driver_command, params)
+            start = time.perf_counter()
+            try:
+                return execute(driver_command, params)
+            finally:
+                current.record(driver_command,
+                               time.perf_counter() - start)
+
+        driver.untimed_execute = execute
+        driver.execute = timed_execute
+    driver.command_recorder = recorder
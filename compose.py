@@ -0,0 +1,95 @@
+from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+
+# Quanto esperar o editor mostrar o texto colado antes de desistir
+PASTE_WAIT_MS = 500
+
+# Cola o texto na caixa como o Ctrl+V faria: o editor do WhatsApp trata o
+# evento paste e mantém as quebras de linha na mesma mensagem. O editor
+# (Lexical) aplica a colagem depois, em uma microtask ou no próximo frame,
+# então a caixa é conferida até arguments[2] ms. Devolve se a caixa ficou
+# com texto (false quando o editor ignorou o evento).
+PASTE_TEXT_JS = """
+var box = arguments[0];
+var deadline = Date.now() + arguments[2];
+var done = arguments[arguments.length - 1];
+var data = new DataTransfer();
+data.setData('text/plain', arguments[1]);
+box.focus();
+box.dispatchEvent(new ClipboardEvent('paste', {
+    clipboardData: data, bubbles: true, cancelable: true
+}));
+(function check() {
+    if (box.textContent.trim().length > 0) {
+        done(true);
+    } else if (Date.now() >= deadline) {
+        done(false);
+    } else {
+        setTimeout(check, 16);
+    }
+})();
+"""
+
+
+def insert_text(driver: WebDriver, box: WebElement, text: str) -> str:
+    """
+    Insere o texto inteiro, com as quebras de linha, na caixa de mensagem
+    sem digitar tecla por tecla. Tenta colar; se o editor não aceitar, usa
+    o Input.insertText do DevTools linha a linha com Shift+Enter entre
+    elas. Retorna o método usado ('paste' ou 'cdp').
+    """
+    if driver.execute_async_script(PASTE_TEXT_JS, box, text, PASTE_WAIT_MS):
+        return 'paste'
+
+    # Uma colagem que chegou depois do limite não pode somar ao texto
+    # inserido abaixo
+    box.clear()
+    box.click()
+    for i, line in enumerate(text.split('\n')):
+        if i:
+            ActionChains(driver).key_down(Keys.SHIFT).send_keys(
+                Keys.ENTER).key_up(Keys.SHIFT).perform()
+        if line:
+            driver.execute_cdp_cmd('Input.insertText', {'text': line})
+    return 'cdp'
+
+
+if __name__ == '__main__':
+    import time
+
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    from standin import StandinServer
+    from whatsapp import COUNT_OUTGOING_JS, Whatsapp
+
+    server = StandinServer()
+    server.start()
+    options = Options()
+    options.add_argument('--headless')
+    driver = webdriver.Chrome(options=options)
+    try:
+        print(f'{"linhas":>6} {"por linha":>10} {"de uma vez":>10} '
+              f'{"mensagens":>10}')
+        for count in (1, 3, 5, 10, 20):
+            text = '\n'.join(f'Linha {i + 1} da mensagem automática do '
+                             f'pedido, com alguns detalhes.'
+                             for i in range(count))
+            results = {}
+            for mode in ('lines', 'bulk'):
+                chat = Whatsapp('Teste', text, send_mode=mode)
+                chat.log_on = False
+                chat.driver = driver
+                driver.get(f'{server.url}/chat?delay=100')
+                start = time.perf_counter()
+                chat.send_msg()
+                results[mode] = (time.perf_counter() - start,
+                                 driver.execute_script(COUNT_OUTGOING_JS))
+            print(f'{count:>6} {results["lines"][0]:>9.2f}s '
+                  f'{results["bulk"][0]:>9.2f}s '
+                  f'{results["lines"][1]:>4} / {results["bulk"][1]}')
+    finally:
+        driver.quit()
+        server.stop()
@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from phone import normalize_phone
+from utils import CONTACTS_JOURNAL_PATH
+
+# Quanto tempo um número sem WhatsApp fica sem ser tentado; dobra a cada
+# nova falha até NEGATIVE_TTL_MAX
+NEGATIVE_TTL_SECONDS = 30 * 60
+NEGATIVE_TTL_MAX = 6 * 60 * 60
+# Títulos e falhas lembrados (cada um); acima disso o usado há mais tempo
+# sai primeiro
+CONTACT_CACHE_MAXSIZE = 1000
+# O journal é regravado só com o que vale quando passa deste múltiplo do
+# tamanho máximo
+JOURNAL_REWRITE_FACTOR = 4
+
+UNRESOLVABLE = 'unresolvable'
+REVALIDATE = 'revalidate'
+
+
+class ContactCache:
+    """
+    Como cada contato aparece no WhatsApp Web. Guarda o título exato que
+    abriu a conversa (com ou sem o nono dígito, por exemplo), para o
+    próximo pedido do mesmo cliente já procurar o formato certo, e os
+    números que não abriram, que ficam um tempo (TTL) sem ser tentados.
+    Vencido o prazo, o número é revalidado só pelo caminho barato.
+
+    No mesmo dia o CheckedStore já evita repetir um número, então o cache
+    vale para os pedidos dos dias seguintes: cada título resolvido e cada
+    falha vão para um journal em disco (tipo<TAB>número<TAB>valor), relido
+    ao abrir. Títulos e falhas são limitados a maxsize cada (LRU).
+    """
+
+    def __init__(self, path=CONTACTS_JOURNAL_PATH,
+                 ttl: float = NEGATIVE_TTL_SECONDS,
+                 max_ttl: float = NEGATIVE_TTL_MAX,
+                 maxsize: int = CONTACT_CACHE_MAXSIZE, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.max_ttl = max_ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self.lock = threading.Lock()
+        self._titles: OrderedDict[str, str] = OrderedDict()
+        # número -> (válido até, falhas seguidas)
+        self._failures: OrderedDict[str, tuple[float, int]] = OrderedDict()
+        self._lines = 0
+        self.title_hits = 0
+        self.skipped = 0
+        self.revalidations = 0
+        self._load()
+
+    def status(self, phone_number: str) -> Optional[str]:
+        """
+        UNRESOLVABLE enquanto o número está no cache negativo, REVALIDATE
+        quando o prazo venceu e None se não há falha registrada
+        """
+        key = normalize_phone(phone_number)
+        with self.lock:
+            failure = self._failures.get(key)
+            if failure is None:
+                return None
+            self._failures.move_to_end(key)
+            if self.clock() < failure[0]:
+                self.skipped += 1
+                return UNRESOLVABLE
+            self.revalidations += 1
+            return REVALIDATE
+
+    def titles(self, phone_number: str, candidates: list[str]) -> list[str]:
+        """
+        Os candidatos com o título que já funcionou na frente
+        """
+        key = normalize_phone(phone_number)
+        with self.lock:
+            title = self._titles.get(key)
+            if title is None:
+                return list(candidates)
+            self._titles.move_to_end(key)
+            self.title_hits += 1
+        return [title] + [c for c in candidates if c != title]
+
+    def resolved(self, phone_number: str, title: str) -> None:
+        key = normalize_phone(phone_number)
+        with self.lock:
+            if self._titles.get(key) == title:
+                self._titles.move_to_end(key)
+                return
+            self._failures.pop(key, None)
+            self._remember(self._titles, key, title)
+            self._write(f'title\t{key}\t{title}')
+
+    def failed(self, phone_number: str) -> float:
+        """
+        Coloca o número no cache negativo e retorna o prazo em segundos
+        """
+        key = normalize_phone(phone_number)
+        with self.lock:
+            count = self._failures.get(key, (0.0, 0))[1] + 1
+            ttl = min(self.ttl * 2 ** (count - 1), self.max_ttl)
+            until = self.clock() + ttl
+            self._remember(self._failures, key, (until, count))
+            self._titles.pop(key, None)
+            self._write(f'fail\t{key}\t{until:.0f}\t{count}')
+            return ttl
+
+    def summary(self) -> str:
+        with self.lock:
+            return (f'contacts: titles={len(self._titles)} '
+                    f'title_hits={self.title_hits} '
+                    f'unresolvable={len(self._failures)} '
+                    f'skipped={self.skipped} '
+                    f'revalidations={self.revalidations}')
+
+    def _remember(self, entries: OrderedDict, key: str, value) -> None:
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.maxsize:
+            entries.popitem(last=False)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, 'r', encoding='utf8') as file:
+                for line in file:
+                    kind, _, rest = line.rstrip('\n').partition('\t')
+                    key, _, value = rest.partition('\t')
+                    if kind == 'title' and key and value:
+                        self._failures.pop(key, None)
+                        self._remember(self._titles, key, value)
+                    elif kind == 'fail' and key:
+                        until, _, count = value.partition('\t')
+                        try:
+                            failure = (float(until), int(count))
+                        except ValueError:
+                            # Linha incompleta de uma gravação interrompida
+                            continue
+                        self._titles.pop(key, None)
+                        self._remember(self._failures, key, failure)
+        except FileNotFoundError:
+            return
+        try:
+            self._rewrite()
+        except OSError as e:
+            print('contacts journal', e.__class__.__name__)
+
+    def _write(self, line: str) -> None:
+        # Gravações raras (um cliente novo ou uma falha): abre a cada uma
+        try:
+            if self._lines >= self.maxsize * JOURNAL_REWRITE_FACTOR:
+                self._rewrite()
+                return
+            with open(self.path, 'a', encoding='utf8') as file:
+                file.write(f'{line}\n')
+            self._lines += 1
+        except OSError as e:
+            print('contacts journal', e.__class__.__name__)
+
+    def _rewrite(self) -> None:
+        """
+        Regrava o journal só com os títulos e falhas lembrados
+        """
+        temp_path = self.path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf8') as file:
+            for key, (until, count) in self._failures.items():
+                file.write(f'fail\t{key}\t{until:.0f}\t{count}\n')
+            for key, title in self._titles.items():
+                file.write(f'title\t{key}\t{title}\n')
+        os.replace(temp_path, self.path)
+        self._lines = len(self._failures) + len(self._titles)
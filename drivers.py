@@ -0,0 +1,97 @@
+import json
+import threading
+from typing import Callable, Optional
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+
+
+def _options_key(options: Options) -> str:
+    return json.dumps(options.to_capabilities(), sort_keys=True, default=str)
+
+
+class DriverPool:
+    """
+    Guarda um Chrome por perfil. O navegador só é aberto no primeiro
+    acquire e é reaproveitado enquanto as opções (perfil, headless,
+    logs) forem as mesmas, inclusive entre um OFF e o ON seguinte.
+
+    O Chrome não abre dois processos no mesmo user-data-dir, então quando
+    as opções mudam o navegador antigo é fechado antes de abrir o novo.
+    Nos demais casos o encerramento acontece em segundo plano.
+
+    factory cria o navegador a partir das opções (webdriver.Chrome por
+    padrão); o fake_driver.py usa um pool com o FakeDriver para rodar o
+    Whatsapp e o Whatsmenu sem Chrome.
+    """
+
+    def __init__(self, factory: Optional[Callable] = None):
+        self.factory = factory or webdriver.Chrome
+        self.lock = threading.Lock()
+        self._drivers: dict[str, tuple[str, webdriver.Chrome]] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self.launches = 0
+
+    def acquire(self, profile, options: Options) -> webdriver.Chrome:
+        key = _options_key(options)
+        # Um lock por perfil: perfis diferentes abrem em paralelo
+        with self._profile_lock(profile):
+            with self.lock:
+                current = self._drivers.pop(str(profile), None)
+            if current is not None:
+                current_key, driver = current
+                if current_key == key and self._is_alive(driver):
+                    with self.lock:
+                        self._drivers[str(profile)] = current
+                    return driver
+                self._quit(driver)
+
+            driver = self.factory(options=options)
+            with self.lock:
+                self.launches += 1
+                self._drivers[str(profile)] = (key, driver)
+            return driver
+
+    def discard(self, profile, wait: bool = False) -> None:
+        """
+        Fecha o navegador do perfil (em segundo plano, salvo wait=True)
+        """
+        with self.lock:
+            current = self._drivers.pop(str(profile), None)
+        if current is not None:
+            self._quit_later(current[1], wait)
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self.lock:
+            drivers = [driver for _, driver in self._drivers.values()]
+            self._drivers.clear()
+        for driver in drivers:
+            self._quit_later(driver, wait)
+
+    def _profile_lock(self, profile) -> threading.Lock:
+        with self.lock:
+            return self._locks.setdefault(str(profile), threading.Lock())
+
+    def _is_alive(self, driver: webdriver.Chrome) -> bool:
+        try:
+            driver.window_handles
+        except WebDriverException:
+            return False
+        return True
+
+    def _quit(self, driver: webdriver.Chrome) -> None:
+        try:
+            driver.quit()
+        except Exception as e:
+            print('driver quit', e.__class__.__name__)
+
+    def _quit_later(self, driver: webdriver.Chrome, wait: bool) -> None:
+        # Thread não daemon: o programa só termina depois do quit
+        thread = threading.Thread(target=self._quit, args=(driver,))
+        thread.start()
+        if wait:
+            thread.join()
+
+
+DRIVERS = DriverPool()
@@ -0,0 +1,462 @@
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+from selenium.common.exceptions import (JavascriptException,
+                                        NoSuchElementException,
+                                        WebDriverException)
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.remote.command import Command
+
+from compose import PASTE_TEXT_JS
+from locators import FIND_FIRST_JS
+from orders import (CARDS_CONTAINER_SELECTOR, EXTRACT_CARDS_JS,
+                    INSTALL_OBSERVER_JS, WAIT_CHANGE_JS)
+from phone import normalize_phone
+from standin import contact_title
+from whatsapp import (CHAT_OPENED_JS, COUNT_OUTGOING_JS, NOT_ON_WHATSAPP,
+                      OPEN_CHAT_JS, ORDER_CODE_SCAN_JS)
+
+# Ida e volta de um comando ao chromedriver local (s), usada quando o
+# LatencyModel não tem um valor próprio para o comando
+ROUND_TRIP_SECONDS = 0.003
+# Comandos que costumam demorar mais que a média
+COMMAND_SECONDS = {
+    Command.GET: 0.5,
+    Command.W3C_EXECUTE_SCRIPT: 0.005,
+    Command.SEND_KEYS_TO_ELEMENT: 0.01,
+    Command.W3C_ACTIONS: 0.01,
+}
+
+
+class LatencyModel:
+    """
+    Quanto cada comando levaria no Chrome de verdade: um tempo por
+    comando (COMMAND_SECONDS, ou o padrão) com uma variação aleatória de
+    até jitter para mais ou para menos
+    """
+
+    def __init__(self, default: float = ROUND_TRIP_SECONDS,
+                 commands: Optional[dict[str, float]] = None,
+                 jitter: float = 0.0, seed: Optional[int] = None):
+        self.default = default
+        self.commands = {**COMMAND_SECONDS, **(commands or {})}
+        self.jitter = jitter
+        self.random = random.Random(seed)
+
+    def seconds(self, command: str) -> float:
+        seconds = self.commands.get(command, self.default)
+        if self.jitter:
+            seconds *= 1 + self.random.uniform(-self.jitter, self.jitter)
+        return seconds
+
+
+class FakeElement:
+    """
+    Elemento do FakeDriver: atributos, texto e o que acontece ao clicar ou
+    digitar nele. Cada método passa pelo driver.execute, como no Selenium.
+    """
+
+    def __init__(self, parent: 'FakeDriver', attributes=None, text: str = '',
+                 on_click: Optional[Callable] = None,
+                 on_keys: Optional[Callable] = None):
+        self.parent = parent
+        self.attributes = dict(attributes or {})
+        self._text = text
+        self.on_click = on_click
+        self.on_keys = on_keys
+        self.displayed = True
+        self.enabled = True
+
+    @property
+    def text(self) -> str:
+        return self._execute(Command.GET_ELEMENT_TEXT)
+
+    def get_attribute(self, name: str):
+        return self._execute(Command.GET_ELEMENT_ATTRIBUTE, {'name': name})
+
+    def click(self) -> None:
+        self._execute(Command.CLICK_ELEMENT)
+
+    def clear(self) -> None:
+        self._execute(Command.CLEAR_ELEMENT)
+
+    def send_keys(self, *value) -> None:
+        self._execute(Command.SEND_KEYS_TO_ELEMENT,
+                      {'text': ''.join(str(v) for v in value)})
+
+    def is_displayed(self) -> bool:
+        return self._execute('isElementDisplayed')
+
+    def is_enabled(self) -> bool:
+        return self._execute(Command.IS_ELEMENT_ENABLED)
+
+    def _execute(self, command: str, params: Optional[dict] = None):
+        return self.parent.execute(
+            command, {'element': self, **(params or {})})['value']
+
+
+class FakeDriver:
+    """
+    Navegador em memória com a mesma interface que o Whatsapp e o
+    Whatsmenu usam do webdriver.Chrome. O DOM é roteirizado: add registra
+    elementos com o seletor exato usado no código (o By é ignorado) e on
+    responde a um script (pelo texto do JS) ou a um comando do WebDriver.
+    Todo comando passa por execute, que conta o comando e soma o tempo do
+    LatencyModel; com realtime o tempo é esperado de verdade, senão só
+    somado em simulated.
+    """
+
+    def __init__(self, latency: Optional[LatencyModel] = None,
+                 realtime: bool = False, options=None):
+        self.latency = latency or LatencyModel()
+        self.realtime = realtime
+        self.options = options
+        self.lock = threading.Lock()
+        self.elements: dict[str, list[FakeElement]] = {}
+        self.handlers: dict[str, Callable] = {}
+        self.current_url = 'about:blank'
+        self.commands: dict[str, int] = {}
+        self.simulated = 0.0
+        self.closed = False
+        self._builtin = {
+            Command.GET: self._get,
+            Command.FIND_ELEMENT: self._find_element,
+            Command.FIND_ELEMENTS: self._find_elements,
+            Command.W3C_EXECUTE_SCRIPT: self._script,
+            Command.W3C_EXECUTE_SCRIPT_ASYNC: self._script,
+            Command.GET_ELEMENT_TEXT: lambda p: p['element']._text,
+            Command.GET_ELEMENT_ATTRIBUTE: lambda p: (
+                p['element'].attributes.get(p['name'])),
+            Command.CLICK_ELEMENT: self._click,
+            Command.CLEAR_ELEMENT: lambda p: self._keys(p['element'], None),
+            Command.SEND_KEYS_TO_ELEMENT: lambda p: self._keys(
+                p['element'], p['text']),
+            'isElementDisplayed': lambda p: p['element'].displayed,
+            Command.IS_ELEMENT_ENABLED: lambda p: p['element'].enabled,
+            Command.GET_ALL_COOKIES: lambda p: [],
+            Command.W3C_GET_WINDOW_HANDLES: lambda p: ['fake'],
+            Command.QUIT: self._quit,
+        }
+
+    # Roteiro do DOM
+
+    def add(self, selector: str, element: Optional[FakeElement] = None,
+            **kwargs) -> FakeElement:
+        """
+        Registra um elemento (ou cria um com kwargs) para o seletor
+        """
+        element = element or FakeElement(self, **kwargs)
+        with self.lock:
+            self.elements.setdefault(selector, []).append(element)
+        return element
+
+    def remove(self, selector: str) -> None:
+        with self.lock:
+            self.elements.pop(selector, None)
+
+    def on(self, key: str, handler: Callable) -> None:
+        """
+        Responde a um script (handler recebe os argumentos do script) ou
+        a um comando do WebDriver (handler recebe os parâmetros)
+        """
+        self.handlers[key] = handler
+
+    def summary(self) -> str:
+        with self.lock:
+            count = sum(self.commands.values())
+            top = sorted(self.commands.items(), key=lambda item: -item[1])
+        return (f'fake driver: {count} commands, {self.simulated:.2f}s '
+                f'simulated ({", ".join(f"{c}={n}" for c, n in top[:6])})')
+
+    # Interface do WebDriver
+
+    def execute(self, driver_command: str, params: Optional[dict] = None):
+        if self.closed and driver_command != Command.QUIT:
+            raise WebDriverException('fake driver closed')
+        seconds = self.latency.seconds(driver_command)
+        with self.lock:
+            self.commands[driver_command] = (
+                self.commands.get(driver_command, 0) + 1)
+            self.simulated += seconds
+        if self.realtime:
+            time.sleep(seconds)
+        params = params or {}
+        handler = self.handlers.get(driver_command)
+        if handler is None:
+            handler = self._builtin.get(driver_command, lambda p: None)
+        return {'value': handler(params)}
+
+    def get(self, url: str) -> None:
+        self.execute(Command.GET, {'url': url})
+
+    def maximize_window(self) -> None:
+        self.execute('maximizeWindow')
+
+    def find_element(self, by: str, value: str) -> FakeElement:
+        return self.execute(Command.FIND_ELEMENT,
+                            {'using': by, 'value': value})['value']
+
+    def find_elements(self, by: str, value: str) -> list[FakeElement]:
+        return self.execute(Command.FIND_ELEMENTS,
+                            {'using': by, 'value': value})['value']
+
+    def execute_script(self, script: str, *args):
+        return self.execute(Command.W3C_EXECUTE_SCRIPT,
+                            {'script': script, 'args': args})['value']
+
+    def execute_async_script(self, script: str, *args):
+        return self.execute(Command.W3C_EXECUTE_SCRIPT_ASYNC,
+                            {'script': script, 'args': args})['value']
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: dict):
+        return self.execute('executeCdpCommand',
+                            {'cmd': cmd, 'params': cmd_args})['value']
+
+    def set_script_timeout(self, time_to_wait: float) -> None:
+        self.execute(Command.SET_TIMEOUTS,
+                     {'script': int(time_to_wait * 1000)})
+
+    def get_cookies(self) -> list[dict]:
+        return self.execute(Command.GET_ALL_COOKIES)['value']
+
+    def get_log(self, log_type: str) -> list[dict]:
+        return self.execute(Command.GET_LOG, {'type': log_type})['value'] or []
+
+    @property
+    def window_handles(self) -> list[str]:
+        return self.execute(Command.W3C_GET_WINDOW_HANDLES)['value']
+
+    def quit(self) -> None:
+        self.execute(Command.QUIT)
+
+    # Comandos embutidos
+
+    def _get(self, params: dict) -> None:
+        self.current_url = params['url']
+
+    def _find_elements(self, params: dict) -> list[FakeElement]:
+        with self.lock:
+            return list(self.elements.get(params['value'], []))
+
+    def _find_element(self, params: dict) -> FakeElement:
+        elements = self._find_elements(params)
+        if not elements:
+            raise NoSuchElementException(
+                f'{params["using"]}={params["value"]}')
+        return elements[0]
+
+    def _script(self, params: dict):
+        handler = self.handlers.get(params['script'])
+        if handler is None:
+            raise JavascriptException(
+                f'no handler for script {params["script"][:40].strip()!r}')
+        return handler(*params['args'])
+
+    def _click(self, params: dict) -> None:
+        element = params['element']
+        if element.on_click is not None:
+            element.on_click(element)
+
+    def _keys(self, element: FakeElement, text: Optional[str]) -> None:
+        if element.on_keys is not None:
+            element.on_keys(element, text)
+
+    def _quit(self, params: dict) -> None:
+        self.closed = True
+
+
+class FakeWhatsapp:
+    """
+    WhatsApp Web roteirizado em um FakeDriver: lista de conversas, links
+    de envio, conversa com caixa de mensagem e balões, e o histórico com
+    ou sem a mensagem com o código do pedido. Números em invalid não
+    existem no WhatsApp; os de ordered já têm o código do pedido hoje.
+    """
+
+    def __init__(self, driver: FakeDriver, ordered=(), invalid=()):
+        self.ordered = {normalize_phone(phone) for phone in ordered}
+        self.invalid = {normalize_phone(phone) for phone in invalid}
+        # Número (só dígitos) da conversa aberta e o texto na caixa
+        self.chat: Optional[str] = None
+        self.draft = ''
+        self.outgoing = 0
+        self.sent: list[tuple[str, str]] = []
+
+        driver.add('side')
+        driver.add('#side #pane-side')
+        self.box = driver.add('#main footer [contenteditable="true"]',
+                              on_keys=self._type)
+        driver.on(OPEN_CHAT_JS, self._open)
+        driver.on(CHAT_OPENED_JS, self._opened)
+        driver.on(ORDER_CODE_SCAN_JS, self._scan)
+        driver.on(COUNT_OUTGOING_JS, lambda: self.outgoing)
+        driver.on(FIND_FIRST_JS, lambda candidates, scope: [0, self.box])
+        driver.on(PASTE_TEXT_JS, self._paste)
+
+    def _open(self, phone_number: str) -> None:
+        self.chat = normalize_phone(phone_number)
+        self.draft = ''
+
+    def _opened(self, titles: list[str]):
+        if self.chat is None:
+            return None
+        if self.chat in self.invalid:
+            return NOT_ON_WHATSAPP
+        title = contact_title(self.chat)
+        return title if title in titles else None
+
+    def _scan(self, title: str, marker: str, url: str) -> dict:
+        found = self.chat in self.ordered
+        return {'found': found, 'position': 0 if found else -1,
+                'scanned': 2}
+
+    def _paste(self, box: FakeElement, text: str, wait_ms: int) -> bool:
+        self.draft += text
+        return True
+
+    def _type(self, box: FakeElement, text: Optional[str]) -> None:
+        if text is None:
+            self.draft = ''
+            return
+        for char in text:
+            if char == Keys.ENTER:
+                if self.draft:
+                    self.outgoing += 1
+                    self.sent.append((self.chat, self.draft))
+                self.draft = ''
+            else:
+                self.draft += char
+
+
+class FakePanel:
+    """
+    Painel do Whatsmenu roteirizado em um FakeDriver: os cards lidos pelo
+    EXTRACT_CARDS_JS e a espera por mudanças do modo push
+    """
+
+    def __init__(self, driver: FakeDriver):
+        self.cards: list[dict] = []
+        # Como o INSTALL_OBSERVER_JS, começa marcado: a primeira espera
+        # volta na hora e o painel (ainda vazio) é lido uma vez
+        self.changed = threading.Event()
+        self.changed.set()
+        driver.add(CARDS_CONTAINER_SELECTOR)
+        driver.on(EXTRACT_CARDS_JS, lambda selector, pattern: list(self.cards))
+        driver.on(INSTALL_OBSERVER_JS, lambda selector: True)
+        driver.on(WAIT_CHANGE_JS, self._wait_change)
+
+    def add_orders(self, phones: list[str]) -> None:
+        for phone in phones:
+            digits = normalize_phone(phone)
+            self.cards.insert(0, {
+                'id': str(len(self.cards) + 1), 'name': 'Cliente Teste',
+                'phone': f'({digits[:2]}) {digits[2:-4]}-{digits[-4:]}',
+                'status': 'Em preparo', 'text': None,
+            })
+        self.changed.set()
+
+    def _wait_change(self, timeout_ms: int) -> str:
+        if self.changed.wait(timeout_ms / 1000):
+            self.changed.clear()
+            return 'changed'
+        return 'timeout'
+
+
+if __name__ == '__main__':
+    import argparse
+    import cProfile
+    import pstats
+    import tempfile
+    from pathlib import Path
+
+    from benchmark import AUTOMATIC_MSG, MSG_TITLE, prepare_profiles
+    from checked import CheckedStore
+    from contacts import ContactCache
+    from drivers import DriverPool
+    from log import LOG_WRITER
+    from tracing import TRACER, stage_percentiles
+    from whatsapp import Whatsapp
+    from whatsmenu import Whatsmenu
+
+    parser = argparse.ArgumentParser(
+        description='Pedidos simulados de ponta a ponta (Whatsmenu e '
+                    'Whatsapp) no FakeDriver, sem Chrome')
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--ordered', type=float, default=0.2,
+                        help='fração com o código do pedido hoje (0.2)')
+    parser.add_argument('--invalid', type=float, default=0.05,
+                        help='fração de números sem WhatsApp (0.05)')
+    parser.add_argument('--realtime', action='store_true',
+                        help='espera de verdade o tempo de cada comando')
+    parser.add_argument('--profile', action='store_true',
+                        help='mostra as funções que mais gastam tempo')
+    args = parser.parse_args()
+
+    phones = [f'859{i:08}' for i in range(args.orders)]
+    shuffled = random.Random(1).sample(phones, len(phones))
+    invalid = shuffled[:int(len(phones) * args.invalid)]
+    ordered = shuffled[len(invalid):
+                       len(invalid) + int(len(phones) * args.ordered)]
+    pages = {}
+
+    def factory(page):
+        def create(options):
+            driver = FakeDriver(realtime=args.realtime, options=options)
+            pages[page] = (driver, FakeWhatsapp(driver, ordered, invalid)
+                           if page == 'whatsapp' else FakePanel(driver))
+            return driver
+        return create
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        LOG_WRITER.path = directory / 'log.txt'
+        TRACER.path = directory / 'traces.jsonl'
+        whatsapp_profile, whatsmenu_profile = prepare_profiles(directory)
+        chat = Whatsapp(MSG_TITLE, AUTOMATIC_MSG, base_url='fake://whatsapp',
+                        profile=whatsapp_profile,
+                        drivers=DriverPool(factory('whatsapp')),
+                        contacts=ContactCache(
+                            directory / 'contacts_journal.txt'))
+        whatsmenu = Whatsmenu(
+            chat, False, '0', base_url='fake://whatsmenu',
+            profile=whatsmenu_profile,
+            session_path=directory / 'session.json',
+            checked=CheckedStore(directory / 'checked_journal.txt'),
+            drivers=DriverPool(factory('whatsmenu')))
+
+        chat.start()
+        # Sem o OrderPipeline: o Whatsmenu chama o check_number na própria
+        # thread, o que mede só a lógica de controle
+        profiler = cProfile.Profile() if args.profile else None
+        scanner = threading.Thread(
+            target=profiler.runcall if profiler else whatsmenu.start,
+            args=(whatsmenu.start,) if profiler else (), daemon=True)
+        scanner.start()
+        whatsmenu.ready.wait(10)
+
+        start = time.perf_counter()
+        pages['whatsmenu'][1].add_orders(phones)
+        while len(whatsmenu.checked) < len(phones) and scanner.is_alive():
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+
+        whatsmenu.window_signal = True
+        pages['whatsmenu'][1].changed.set()
+        scanner.join(10)
+        whatsmenu.close()
+        LOG_WRITER.close()
+        outcomes, stages = stage_percentiles(TRACER.path)
+
+    driver, page = pages['whatsapp']
+    print(f'{len(whatsmenu.checked)} pedidos em {elapsed:.2f}s '
+          f'({len(whatsmenu.checked) / elapsed:,.0f} pedidos/s) '
+          f'{", ".join(f"{k}={v}" for k, v in sorted(outcomes.items()))}')
+    print(f'{len(page.sent)} mensagens enviadas')
+    print(f'WhatsApp {driver.summary()}')
+    print(f'Whatsmenu {pages["whatsmenu"][0].summary()}')
+    print(f'tempo simulado do navegador por pedido: '
+          f'{driver.simulated / max(1, len(whatsmenu.checked)) * 1000:.1f}ms')
+    if profiler:
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
@@ -0,0 +1,122 @@
+import json
+from typing import Optional
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from network import find_orders
+from utils import SESSION_WHATSMENU_PATH
+
+# Caminho da página de login do painel; um redirecionamento para ela
+# indica sessão expirada
+LOGIN_PATH = '/auth/login'
+
+
+class SessionExpired(Exception):
+    """
+    A sessão salva não vale mais e é preciso logar pelo navegador
+    """
+
+
+class OrdersUnavailable(Exception):
+    """
+    O endpoint respondeu sem os pedidos (404, erro do servidor, página
+    HTML). Pode ser passageiro ou o endpoint errado; a sessão continua
+    valendo.
+    """
+
+
+def save_session(cookies: list[dict], endpoint: Optional[str] = None,
+                 path=SESSION_WHATSMENU_PATH) -> None:
+    """
+    Guarda os cookies do navegador logado para o cliente HTTP
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    session = load_session(path) or {}
+    session['cookies'] = cookies
+    if endpoint:
+        session['endpoint'] = endpoint
+    with open(path, 'w', encoding='utf8') as file:
+        json.dump(session, file, ensure_ascii=False)
+
+
+def load_session(path=SESSION_WHATSMENU_PATH) -> Optional[dict]:
+    try:
+        with open(path, 'r', encoding='utf8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+class HttpOrderSource:
+    """
+    Busca os pedidos direto no endpoint do painel, sem navegador, usando
+    os cookies da sessão salva. A conexão é mantida aberta entre as
+    consultas e, quando o servidor manda ETag ou Last-Modified, as
+    consultas seguintes são condicionais (304 devolve os pedidos já
+    conhecidos).
+    """
+
+    def __init__(self, base_url: str, cookies: list[dict], endpoint: str,
+                 timeout: float = 10):
+        self.url = urljoin(f'{base_url}/', endpoint.lstrip('/'))
+        if urlsplit(endpoint).netloc:
+            self.url = endpoint
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_maxsize=1))
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=1))
+        self.session.headers['Accept'] = 'application/json'
+        for cookie in cookies:
+            self.session.cookies.set(
+                cookie['name'], cookie['value'],
+                domain=cookie.get('domain', ''), path=cookie.get('path', '/')
+            )
+        self.etag = None
+        self.last_modified = None
+        self.orders: list[dict] = []
+
+    @classmethod
+    def from_session(cls, base_url: str, path=SESSION_WHATSMENU_PATH):
+        """
+        Cria o cliente a partir da sessão salva, ou None se não houver
+        sessão ou se o endpoint dos pedidos ainda não foi descoberto
+        """
+        session = load_session(path)
+        if (not session or not session.get('cookies')
+                or not session.get('endpoint')):
+            return None
+        return cls(base_url, session['cookies'], session['endpoint'])
+
+    def fetch(self) -> list[dict]:
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+
+        response = self.session.get(self.url, headers=headers,
+                                    timeout=self.timeout,
+                                    allow_redirects=False)
+        if response.status_code == 304:
+            return self.orders
+        location = urlsplit(response.headers.get('Location', '')).path
+        if (response.status_code in (401, 403) or
+                (response.is_redirect and location.startswith(LOGIN_PATH))):
+            raise SessionExpired(f'{response.status_code} {self.url}')
+        if (not response.ok or response.is_redirect or
+                'json' not in response.headers.get('Content-Type', '')):
+            raise OrdersUnavailable(f'{response.status_code} {self.url}')
+        try:
+            payload = response.json()
+        except ValueError:
+            raise OrdersUnavailable(f'invalid JSON {self.url}')
+
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        self.orders = find_orders(payload)
+        return self.orders
+
+    def close(self) -> None:
+        self.session.close()
@@ -0,0 +1,139 @@
+import threading
+import time
+from typing import Optional
+
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support.wait import WebDriverWait
+
+from metrics import Timings
+
+# Testa os candidatos na ordem e devolve o primeiro que existir na página
+# como [índice, elemento]. Candidatos que começam com '/' ou '(' são
+# XPath, os demais são seletores CSS. Com um escopo (seletor CSS em
+# arguments[1]) só valem elementos dentro dele; sem o escopo na página
+# nenhum candidato vale.
+FIND_FIRST_JS = """
+var candidates = arguments[0];
+var scope = arguments[1] ? document.querySelector(arguments[1]) : document;
+if (!scope) {
+    return null;
+}
+function first(selector) {
+    if (selector[0] !== '/' && selector[0] !== '(') {
+        return scope.querySelector(selector);
+    }
+    var nodes = document.evaluate(
+        selector, document, null,
+        XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (var j = 0; j < nodes.snapshotLength; j++) {
+        if (scope.contains(nodes.snapshotItem(j))) {
+            return nodes.snapshotItem(j);
+        }
+    }
+    return null;
+}
+for (var i = 0; i < candidates.length; i++) {
+    var element = null;
+    try {
+        element = first(candidates[i]);
+    } catch (e) {
+        element = null;
+    }
+    if (element) {
+        return [i, element];
+    }
+}
+return null;
+"""
+
+# Intervalo entre as tentativas enquanto nenhum candidato aparece
+POLL_SECONDS = 0.1
+
+
+class SelectorRegistry:
+    """
+    Candidatos de seletor para cada papel (caixa de mensagem, botão de nova
+    conversa...). Todos os candidatos de um papel são testados em uma única
+    chamada ao navegador, com o último vencedor na frente. Quando o
+    vencedor some (o WhatsApp mudou o HTML) conta um miss e o próximo
+    candidato que existir passa a ser o vencedor.
+
+    Um papel com escopo em scopes só aceita elementos dentro dele, também
+    para o vencedor: um candidato genérico que venceu uma vez não passa a
+    devolver outro elemento da página (a busca da lateral no lugar da
+    caixa de mensagem).
+    """
+
+    def __init__(self, roles: dict[str, list[str]], timings: Timings,
+                 scopes: Optional[dict[str, str]] = None):
+        self.roles = roles
+        self.scopes = scopes or {}
+        self.timings = timings
+        self.lock = threading.Lock()
+        self.winners: dict[str, str] = {}
+        self.lookups: dict[str, int] = {role: 0 for role in roles}
+        self.misses: dict[str, int] = {role: 0 for role in roles}
+        self.resolutions: dict[str, int] = {role: 0 for role in roles}
+
+    def find(self, driver: WebDriver, role: str,
+             timeout: float) -> WebElement:
+        """
+        Espera até timeout segundos por algum candidato do papel. Levanta
+        TimeoutException se nenhum aparecer.
+        """
+        candidates = self._ordered(role)
+        scope = self.scopes.get(role)
+        start = time.perf_counter()
+        try:
+            index, element = WebDriverWait(
+                driver, timeout, poll_frequency=POLL_SECONDS
+            ).until(
+                lambda x: x.execute_script(FIND_FIRST_JS, candidates, scope))
+        except Exception:
+            self._resolved(role, None, time.perf_counter() - start)
+            raise
+        self._resolved(role, candidates[index], time.perf_counter() - start)
+        return element
+
+    def winner(self, role: str):
+        with self.lock:
+            return self.winners.get(role)
+
+    def summary(self) -> str:
+        """
+        Uma linha por papel: buscas, misses, resoluções e o vencedor
+        """
+        with self.lock:
+            lines = [
+                f'selector {role}: lookups={self.lookups[role]} '
+                f'misses={self.misses[role]} '
+                f'resolutions={self.resolutions[role]} '
+                f'winner={self.winners.get(role)}'
+                for role in self.roles
+            ]
+        return '\n'.join(lines)
+
+    def _ordered(self, role: str) -> list[str]:
+        candidates = self.roles[role]
+        with self.lock:
+            winner = self.winners.get(role)
+        if winner is None:
+            return list(candidates)
+        return [winner] + [c for c in candidates if c != winner]
+
+    def _resolved(self, role: str, selector, seconds: float) -> None:
+        with self.lock:
+            self.lookups[role] += 1
+            previous = self.winners.get(role)
+            # Miss: nenhum candidato apareceu ou o vencedor anterior sumiu
+            if selector is None or (previous is not None and
+                                    previous != selector):
+                self.misses[role] += 1
+            resolved = selector is not None and selector != previous
+            if resolved:
+                self.resolutions[role] += 1
+                self.winners[role] = selector
+        self.timings.add(f'selector.{role}', seconds)
+        if resolved:
+            self.timings.add(f'selector.{role}.resolve', seconds)
@@ -1,15 +1,152 @@
+import atexit
 import datetime
+import os
+import queue
+import threading
+import time
 
 from utils import FILE_LOG
 
 datetime_now = datetime.datetime
 
+# Linhas acumuladas antes de gravar, ou segundos desde a primeira linha
+# pendente, o que vier primeiro
+BATCH_SIZE = 200
+FLUSH_SECONDS = 1.0
+# Tamanho em que o log.txt é rotacionado (log.txt.1, log.txt.2...) e
+# quantos arquivos antigos são mantidos
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 3
+
 try:
     open(FILE_LOG, 'xt', encoding='UTF-8') if not FILE_LOG.exists() else None
 except Exception:
     ...
 
 
+class LogWriter:
+    """
+    Grava o log em segundo plano. Quem loga só coloca a linha na fila; uma
+    thread junta as linhas e grava em lotes (BATCH_SIZE linhas ou
+    FLUSH_SECONDS), formatando a data uma vez por segundo, e rotaciona o
+    arquivo quando passa de MAX_BYTES.
+    """
+
+    def __init__(self, path=FILE_LOG, batch_size: int = BATCH_SIZE,
+                 flush_seconds: float = FLUSH_SECONDS,
+                 max_bytes: int = MAX_BYTES,
+                 backup_count: int = BACKUP_COUNT):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self._file = None
+        self._second = None
+        self._stamp = ''
+
+    def write(self, msg: str) -> None:
+        if self.thread is None:
+            self._start()
+        self.queue.put((time.time(), msg))
+
+    def flush(self, timeout: float = 5) -> bool:
+        """
+        Espera tudo o que já foi enfileirado ir para o disco
+        """
+        if self.thread is None:
+            return True
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5) -> None:
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join(timeout)
+        self.thread = None
+
+    def _start(self) -> None:
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self._run, name='log-writer', daemon=True)
+                self.thread.start()
+
+    def _run(self) -> None:
+        batch = []
+        deadline = None
+        while True:
+            timeout = (None if deadline is None else
+                       max(0.0, deadline - time.monotonic()))
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False
+
+            if isinstance(item, tuple):
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_seconds
+                if len(batch) < self.batch_size:
+                    continue
+
+            # Lote cheio, prazo vencido, flush ou encerramento
+            if batch:
+                self._write(batch)
+                batch = []
+            deadline = None
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                return
+
+    def _format(self, created: float, msg: str) -> str:
+        second = int(created)
+        if second != self._second:
+            self._second = second
+            self._stamp = datetime_now.fromtimestamp(second).strftime(
+                '%d/%m/%Y %H:%M:%S')
+        return f'{msg} {self._stamp}\n'
+
+    def _write(self, batch: list[tuple[float, str]]) -> None:
+        try:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf8')
+            self._file.write(''.join(self._format(created, msg)
+                                     for created, msg in batch))
+            self._file.flush()
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+        except OSError as e:
+            print('log', e.__class__.__name__)
+            self._file = None
+
+    def _rotate(self) -> None:
+        self._file.close()
+        self._file = None
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f'{self.path}.{i}'
+            if os.path.exists(source):
+                os.replace(source, f'{self.path}.{i + 1}')
+        if self.backup_count > 0:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, 'a', encoding='utf8')
+
+
+LOG_WRITER = LogWriter()
+atexit.register(LOG_WRITER.close)
+
+
 class Log:
 
     log_on = True
@@ -18,28 +155,75 @@ class Log:
     def log_success(self, msg):
         if not self.log_on:
             return
-        return self._log(
-            f'SUCCESS: {msg} ({self.__class__.__name__}) '
-            f"{datetime_now.now().strftime('%d/%m/%Y %H:%M:%S')}"
-        )
+        return self._log(f'SUCCESS: {msg} ({self.__class__.__name__})')
 
     def log_error(self, msg):
         if not self.log_on:
             return
-        return self._log(
-            f'ERROR: {msg} ({self.__class__.__name__}) '
-            f"{datetime_now.now().strftime('%d/%m/%Y %H:%M:%S')}"
-        )
+        return self._log(f'ERROR: {msg} ({self.__class__.__name__})')
 
 
 class LogFileMixin(Log):
     def _log(self, msg):
-        with open(FILE_LOG, 'a', encoding='utf8') as file:
-            file.write(msg)
-            file.write('\n')
+        # A data é acrescentada pelo LOG_WRITER ao gravar
+        LOG_WRITER.write(msg)
 
 
 if __name__ == '__main__':
-    test = LogFileMixin()
-    test.log_success('vincii')
-    test.log_error('camiiss')
+    import tempfile
+    from pathlib import Path
+
+    count = 20_000
+
+    class DirectLog(Log):
+        """
+        Como era antes: abre, grava uma linha e fecha a cada chamada
+        """
+
+        def __init__(self, path):
+            self.path = path
+
+        def log_success(self, msg):
+            if not self.log_on:
+                return
+            return self._log(
+                f'SUCCESS: {msg} ({self.__class__.__name__}) '
+                f"{datetime_now.now().strftime('%d/%m/%Y %H:%M:%S')}"
+            )
+
+        def _log(self, msg):
+            with open(self.path, 'a', encoding='utf8') as file:
+                file.write(msg)
+                file.write('\n')
+
+    class QueuedLog(Log):
+        def __init__(self, writer):
+            self.writer = writer
+
+        def _log(self, msg):
+            self.writer.write(msg)
+
+    def calls_per_second(log) -> float:
+        start = time.perf_counter()
+        for i in range(count):
+            log.log_success('85999990000 chat open via link')
+        return count / (time.perf_counter() - start)
+
+    with tempfile.TemporaryDirectory() as directory:
+        direct = DirectLog(Path(directory) / 'direct.txt')
+        writer = LogWriter(Path(directory) / 'queued.txt')
+        queued = QueuedLog(writer)
+        direct_rate = calls_per_second(direct)
+        queued_rate = calls_per_second(queued)
+        start = time.perf_counter()
+        writer.flush(timeout=60)
+        drain = time.perf_counter() - start
+        writer.close()
+        queued.log_on = False
+        off_rate = calls_per_second(queued)
+
+    print(f'{count} chamadas de log_success')
+    print(f'antes (abre/grava/fecha): {direct_rate:,.0f} chamadas/s')
+    print(f'fila + gravação em lote: {queued_rate:,.0f} chamadas/s '
+          f'(gravação terminou {drain * 1000:.0f} ms depois)')
+    print(f'log_on=False: {off_rate:,.0f} chamadas/s')
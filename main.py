@@ -6,12 +6,18 @@ from PySide6.QtGui import QIcon
 from PySide6.QtWidgets import QApplication, QMainWindow, QMessageBox
 from selenium.common.exceptions import NoSuchElementException
 
+from drivers import DRIVERS
+from log import LOG_WRITER
 from mainwindow import Ui_MainWindow
+from pipeline import OrderPipeline
 from settings_window import Ui_Settings
 from utils import SETTINGS_PROFILE_PATH, STYLE, WINDOW_ICON_PATH
 from whatsapp import LogFileMixin, Whatsapp
 from whatsmenu import Whatsmenu
 
+# Quanto esperar as threads do pipeline saírem depois do OFF
+PIPELINE_JOIN_TIMEOUT = 5
+
 
 class BrowserThread(QThread, LogFileMixin):
     finished = Signal()
@@ -22,31 +28,104 @@ class BrowserThread(QThread, LogFileMixin):
         self.chat = chat
         self.whatsmenu = whatsmenu
         self.interface_closed = interface_closed_callback
+        self.pipeline = None
+        self.started = 0.0
 
     def run(self):
+        # Os dois navegadores sobem em paralelo: o Whatsmenu na thread de
+        # leitura do pipeline e o WhatsApp aqui. Os pedidos lidos antes do
+        # WhatsApp ficar pronto esperam na fila.
+        self.started = time.perf_counter()
+        self.pipeline = OrderPipeline(self.chat, self.whatsmenu)
+        self.pipeline.start()
+
         try:
-            time.sleep(3)
             self.chat.start()
         except NoSuchElementException as e:
+            self.pipeline.stop()
+            self.wait_pipeline()
             self.error.emit(f'start chat canceled {e.__class__.__name__}')
             return
         except Exception as e:
+            self.pipeline.stop()
+            self.wait_pipeline()
             self.error.emit(f'start chat canceled {e.__class__.__name__}')
             return
 
         self.log_success('WhatsApp started successfully')
+        self.log_success(f'WhatsApp ready after '
+                         f'{time.perf_counter() - self.started:.1f}s\n'
+                         f'{self.chat.timings.summary("startup")}')
 
         if not self.interface_closed():
-            time.sleep(7)
-            try:
-                self.log_success('Whatsmenu starting')
-                self.whatsmenu.start()
-            except Exception as e:
-                self.error.emit(
-                    f'start whatsmenu canceled {e.__class__.__name__}')
+            self.supervise()
+        else:
+            self.pipeline.stop()
+            self.wait_pipeline()
 
         self.finished.emit()
 
+    def wait_pipeline(self):
+        """
+        Espera as threads do pipeline saírem. Se alguma continuar presa em
+        um comando do Selenium, os dois navegadores saem do DRIVERS e são
+        fechados: o próximo ON abre outros em vez de dividir o mesmo Chrome
+        entre duas threads.
+        """
+        self.pipeline.join(PIPELINE_JOIN_TIMEOUT)
+        if not self.pipeline.running():
+            return
+        self.log_error('Pipeline still running after stop - '
+                       'discarding browsers')
+        self.chat.drivers.discard(self.chat.profile, wait=True)
+        self.whatsmenu.drivers.discard(self.whatsmenu.profile, wait=True)
+        # Sem o navegador os comandos pendentes falham e as threads saem
+        self.pipeline.join(PIPELINE_JOIN_TIMEOUT)
+        if self.pipeline.running():
+            self.log_error('Pipeline threads did not exit')
+
+    def supervise(self):
+        """
+        Acompanha as etapas de leitura e envio, registra quando o painel fica
+        pronto e a profundidade da fila sempre que ela muda
+        """
+        last_depth = 0
+        menu_ready = False
+        while self.pipeline.is_alive():
+            if self.interface_closed() or self.whatsmenu.window_signal:
+                self.pipeline.stop()
+                break
+
+            if not menu_ready and self.whatsmenu.ready.is_set():
+                menu_ready = True
+                self.log_success(
+                    f'Whatsmenu ready after '
+                    f'{time.perf_counter() - self.started:.1f}s\n'
+                    f'{self.whatsmenu.timings.summary("startup")}')
+
+            depth = self.pipeline.update_depth()
+            if depth != last_depth:
+                self.log_success(f'Order queue depth: {depth} '
+                                 f'(max {self.pipeline.max_depth})')
+                last_depth = depth
+            time.sleep(1)
+
+        self.wait_pipeline()
+        if self.pipeline.scan_error is not None:
+            self.error.emit('start whatsmenu canceled '
+                            f'{self.pipeline.scan_error.__class__.__name__}')
+        self.log_success(f'Pipeline stopped: {self.pipeline.sent} sent, '
+                         f'max queue depth {self.pipeline.max_depth}\n'
+                         f'{self.chat.timings.summary("chat")}\n'
+                         f'{self.chat.timings.summary("send")}\n'
+                         f'{self.chat.timings.summary("selector")}\n'
+                         f'{self.chat.selectors.summary()}\n'
+                         f'{self.chat.contacts.summary()}\n'
+                         f'{self.chat.timings.summary("recovery")}')
+        if self.chat.record_commands:
+            self.log_success(f'WhatsApp {self.chat.commands.summary()}\n'
+                             f'Whatsmenu {self.whatsmenu.commands.summary()}')
+
 
 class Interface(Ui_MainWindow, QMainWindow):
     def __init__(self, parent=None, parameters: dict = {}) -> None:
@@ -77,17 +156,25 @@ class Interface(Ui_MainWindow, QMainWindow):
         self.wait_time = parameters['wait_time']
         self.log_on = parameters['log_on']
         self.check_messages = parameters['check_messages']
+        # Só pelo settings.json: mede cada comando dos navegadores
+        self.record_commands = parameters.get('record_commands', False)
         self.browser_thread = None
         self.chat = Whatsapp(msg_title=self.msg_title,
                              automatic_msg=self.automatic_msg,
                              force_visible=self.force_visible,
-                             check_messages=self.check_messages)
+                             check_messages=self.check_messages,
+                             record_commands=self.record_commands)
         self.chat.log_on = self.log_on
         self.whatsmenu = Whatsmenu(
-            self.chat, self.force_visible, self.wait_time)
+            self.chat, self.force_visible, self.wait_time,
+            record_commands=self.record_commands)
 
     def button_click(self):
         if self.label.text() == 'OFF':
+            # Um OFF anterior deixa os sinais de parada ligados
+            self.chat.window_signal = False
+            self.whatsmenu.window_signal = False
+
             # Cria a thread
             self.browser_thread = BrowserThread(
                 self.chat,
@@ -107,29 +194,29 @@ class Interface(Ui_MainWindow, QMainWindow):
             self.pushButton.setDisabled(True)
         else:
             self.whatsmenu.window_signal = True
+            self.chat.window_signal = True
 
             # Para a thread se estiver rodando
             if self.browser_thread and self.browser_thread.isRunning():
                 self.browser_thread.quit()
                 self.browser_thread.wait()
 
-            try:
-                self.whatsmenu.driver.close()
-            except Exception as e:
-                print('whatsmenu close()', e.__class__.__name__)
-
-            try:
-                self.chat.driver.close()
-            except Exception as e:
-                print('chat close()', e.__class__.__name__)
+            # Os navegadores continuam abertos no DRIVERS e são
+            # reaproveitados no próximo ON
+            self.whatsmenu.close()
+            self.chat.close()
 
-            # Recria os objetos
+            # Recria os objetos; os contatos já resolvidos continuam valendo
+            contacts = self.chat.contacts
             self.chat = Whatsapp(msg_title=self.msg_title,
                                  automatic_msg=self.automatic_msg,
                                  force_visible=self.force_visible,
-                                 check_messages=self.check_messages)
+                                 check_messages=self.check_messages,
+                                 record_commands=self.record_commands)
+            self.chat.contacts = contacts
             self.whatsmenu = Whatsmenu(
-                self.chat, self.force_visible, self.wait_time)
+                self.chat, self.force_visible, self.wait_time,
+                record_commands=self.record_commands)
 
             self.label.setText('OFF')
             self.label.setStyleSheet('')
@@ -142,18 +229,17 @@ class Interface(Ui_MainWindow, QMainWindow):
             self.browser_thread.quit()
             self.browser_thread.wait(5000)  # Espera até 5 segundos
 
-        if self.chat.driver is not None:
-            try:
-                self.chat.close()
-                self.chat.driver.quit()
-            except Exception as e:
-                print('chat close()', e.__class__.__name__)
-        if self.whatsmenu.driver is not None:
-            try:
-                self.whatsmenu.close()
-                self.whatsmenu.driver.quit()
-            except AttributeError as e:
-                print('whatsmenu close()', e.__class__.__name__)
+        try:
+            self.chat.close()
+            self.whatsmenu.close()
+        except Exception as e:
+            print('close()', e.__class__.__name__)
+
+        # Fecha os navegadores em segundo plano; o processo só termina
+        # depois que eles saírem
+        DRIVERS.shutdown()
+        # Grava o que ainda está na fila do log
+        LOG_WRITER.close()
 
     def adjustsizefixed(self) -> None:
         self.setFixedSize(self.width(), self.height())
@@ -0,0 +1,86 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Timings:
+    """
+    Acumula as durações de cada etapa (quantidade, total, mínimo, máximo e
+    último valor) para saber onde o tempo está indo
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats: dict[str, dict[str, float]] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self.lock:
+            stat = self.stats.setdefault(stage, {
+                'count': 0, 'total': 0.0, 'min': seconds, 'max': seconds,
+                'last': seconds,
+            })
+            stat['count'] += 1
+            stat['total'] += seconds
+            stat['min'] = min(stat['min'], seconds)
+            stat['max'] = max(stat['max'], seconds)
+            stat['last'] = seconds
+
+    @contextmanager
+    def measure(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def last(self, stage: str) -> float:
+        with self.lock:
+            return self.stats.get(stage, {}).get('last', 0.0)
+
+    def summary(self, prefix: str = '') -> str:
+        """
+        Uma linha por etapa: nome, quantidade, média, máximo e último
+        """
+        with self.lock:
+            lines = [
+                f'{stage}: n={stat["count"]} '
+                f'avg={stat["total"] / stat["count"]:.3f}s '
+                f'max={stat["max"]:.3f}s last={stat["last"]:.3f}s'
+                for stage, stat in sorted(self.stats.items())
+                if stage.startswith(prefix)
+            ]
+        return '\n'.join(lines)
+
+
+class Stopwatch:
+    """
+    Marca etapas em sequência: cada lap registra em timings o tempo desde
+    a marcação anterior e guarda o detalhamento da execução atual
+    """
+
+    def __init__(self, timings: Timings, prefix: str = ''):
+        self.timings = timings
+        self.prefix = prefix
+        self.laps: dict[str, float] = {}
+        self.start = self.last_mark = time.perf_counter()
+
+    def lap(self, stage: str) -> float:
+        now = time.perf_counter()
+        seconds = now - self.last_mark
+        self.last_mark = now
+        self.laps[stage] = self.laps.get(stage, 0.0) + seconds
+        self.timings.add(f'{self.prefix}{stage}', seconds)
+        return seconds
+
+    def stop(self) -> float:
+        """
+        Registra o total como etapa 'total' e o retorna
+        """
+        total = time.perf_counter() - self.start
+        self.timings.add(f'{self.prefix}total', total)
+        return total
+
+    def __str__(self) -> str:
+        laps = ', '.join(f'{stage} {seconds:.2f}s'
+                         for stage, seconds in self.laps.items())
+        return f'{laps}, total {time.perf_counter() - self.start:.2f}s'
@@ -0,0 +1,217 @@
+import json
+from typing import Optional
+
+from selenium.common.exceptions import WebDriverException
+
+# Chaves que costumam trazer o telefone do cliente nos pedidos
+PHONE_KEYS = ('phone', 'whatsapp', 'cellphone', 'telefone', 'celular')
+ID_KEYS = ('code', 'id')
+NAME_KEYS = ('name', 'nome')
+STATUS_KEYS = ('status',)
+
+# Última requisição feita pela página (fetch/XHR) com arguments[0] no
+# endereço, pela Resource Timing API; não precisa do log de performance
+FIND_REQUEST_URL_JS = r'''
+const entries = performance.getEntriesByType('resource');
+for (let i = entries.length - 1; i >= 0; i--) {
+    const entry = entries[i];
+    if ((entry.initiatorType === 'fetch' ||
+         entry.initiatorType === 'xmlhttprequest') &&
+        entry.name.includes(arguments[0])) {
+        return entry.name;
+    }
+}
+return null;
+'''
+
+
+def clean_phone(value) -> str:
+    """
+    Deixa só os dígitos do telefone, sem o código do país
+    """
+    digits = ''.join(i for i in str(value) if i.isdecimal())
+    if len(digits) in (12, 13) and digits.startswith('55'):
+        digits = digits[2:]
+    return digits
+
+
+def _first(data: dict, keys: tuple):
+    for key in keys:
+        value = data.get(key)
+        if value not in (None, '', [], {}):
+            return value
+    return None
+
+
+def find_orders(payload) -> list[dict]:
+    """
+    Procura pedidos em qualquer nível do JSON recebido pelo painel.
+    Um pedido é um objeto com identificador e telefone do cliente, que pode
+    estar no próprio objeto ou em um objeto filho (ex.: "client").
+    """
+    orders = []
+    stack = [payload]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            stack.extend(reversed(item))
+            continue
+        if not isinstance(item, dict):
+            continue
+
+        order_id = _first(item, ID_KEYS)
+        phone = _first(item, PHONE_KEYS)
+        name = _first(item, NAME_KEYS)
+        if order_id is not None and phone is None:
+            for child in item.values():
+                if isinstance(child, dict) and _first(child, PHONE_KEYS):
+                    phone = _first(child, PHONE_KEYS)
+                    name = name or _first(child, NAME_KEYS)
+                    break
+
+        if order_id is not None and isinstance(phone, (str, int)):
+            orders.append({
+                'id': str(order_id),
+                'name': name if isinstance(name, str) else None,
+                'phone': clean_phone(phone),
+                'status': _first(item, STATUS_KEYS),
+            })
+            continue
+
+        stack.extend(reversed(list(item.values())))
+    return orders
+
+
+def _parse_body(body: str):
+    """
+    Aceita JSON puro e frames de websocket no formato socket.io (42[...])
+    """
+    body = body.strip()
+    start = min(
+        (i for i in (body.find('{'), body.find('[')) if i >= 0),
+        default=-1
+    )
+    if start < 0:
+        return None
+    try:
+        return json.loads(body[start:])
+    except ValueError:
+        return None
+
+
+class NetworkOrderReader:
+    """
+    Lê os pedidos direto das respostas de rede do painel, usando o log de
+    performance do Chrome (goog:loggingPrefs) e o DevTools para buscar o
+    corpo das respostas. Precisa de um driver criado com
+    enable_performance_log.
+
+    Uma resposta HTTP com pedidos é a lista atual do painel e substitui a
+    anterior; os frames de websocket só acrescentam pedidos até a próxima
+    lista. Assim pedidos que saíram do painel não ficam guardados.
+    """
+
+    def __init__(self, url_filter: str = '/request'):
+        self.url_filter = url_filter
+        self.orders: dict[str, dict] = {}
+        self.last_url = None
+
+    def read(self, driver, done=()) -> list[dict]:
+        """
+        Processa os eventos de rede desde a última leitura e retorna os
+        pedidos conhecidos, tirando os de telefone em done (já atendidos)
+        """
+        for entry in driver.get_log('performance'):
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+
+            method = message.get('method')
+            params = message.get('params', {})
+            if method == 'Network.responseReceived':
+                self._read_response(driver, params)
+            elif method == 'Network.webSocketFrameReceived':
+                payload = params.get('response', {}).get('payloadData', '')
+                self._add(_parse_body(payload))
+
+        if done:
+            self.orders = {
+                order_id: order for order_id, order in self.orders.items()
+                if order['phone'] not in done
+            }
+        return list(self.orders.values())
+
+    def find_url(self, driver) -> Optional[str]:
+        """
+        Endereço dos pedidos em qualquer modo de extração: o visto no log
+        de performance ou, sem ele, o da última requisição da página
+        """
+        if self.last_url:
+            return self.last_url
+        try:
+            return driver.execute_script(FIND_REQUEST_URL_JS,
+                                         self.url_filter) or None
+        except WebDriverException:
+            return None
+
+    def _read_response(self, driver, params: dict) -> None:
+        response = params.get('response', {})
+        url = response.get('url', '')
+        if (self.url_filter not in url or
+                'json' not in response.get('mimeType', '')):
+            return
+
+        try:
+            body = driver.execute_cdp_cmd(
+                'Network.getResponseBody', {'requestId': params['requestId']}
+            )
+        except WebDriverException:
+            # O corpo pode já ter sido descartado pelo navegador
+            return
+
+        if self._add(_parse_body(body.get('body', '')), replace=True):
+            self.last_url = url
+
+    def _add(self, payload, replace: bool = False) -> bool:
+        if payload is None:
+            return False
+        orders = find_orders(payload)
+        if not orders:
+            return False
+        if replace:
+            self.orders = {}
+        for order in orders:
+            self.orders[order['id']] = order
+        return True
+
+
+def enable_performance_log(options) -> None:
+    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+
+if __name__ == '__main__':
+    import time
+
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    from standin import StandinServer
+
+    server = StandinServer()
+    server.start()
+    options = Options()
+    options.add_argument(r'--headless')
+    enable_performance_log(options)
+    driver = webdriver.Chrome(options=options)
+    try:
+        driver.get(f'{server.url}/dashboard/request')
+        reader = NetworkOrderReader()
+        server.add_orders(3)
+        time.sleep(3)
+        for order in reader.read(driver):
+            print(order)
+        print('endpoint:', reader.last_url)
+    finally:
+        driver.quit()
+        server.stop()
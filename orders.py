@@ -0,0 +1,187 @@
+import hashlib
+
+from phone import extract_phones_batch
+
+CARDS_SELECTOR = '#main > section > div'
+# No modo por elementos, mesmo sem mudança nas referências, os textos são
+# relidos a cada tantas leituras: o painel pode trocar o conteúdo de um
+# card sem trocar o nó
+FULL_READ_EVERY = 10
+
+# Lê todos os cards do painel em uma única chamada ao navegador
+EXTRACT_CARDS_JS = r'''
+const cards = document.querySelectorAll(arguments[0]);
+const phoneRegex = new RegExp(arguments[1]);
+const result = [];
+for (const card of cards) {
+    const text = card.innerText || '';
+    const lines = text.split('\n').map(l => l.trim()).filter(l => l);
+    const id = (text.match(/#\s?(\d+)/) || [])[1] || null;
+    const phone = (text.match(phoneRegex) || [])[0] || null;
+    const name = lines.find(l => !l.includes('#') && !l.includes('(') &&
+                                 !l.includes('R$')) || null;
+    const badge = card.querySelector('[class*="badge"], [class*="status"]');
+    result.push({
+        id: id,
+        name: name,
+        phone: phone,
+        status: badge ? badge.innerText.trim() : null,
+        text: phone ? null : text,
+    });
+}
+return result;
+'''
+
+CARDS_CONTAINER_SELECTOR = '#main > section'
+
+# Observa a lista de cards e marca quando entra ou sai algum pedido
+INSTALL_OBSERVER_JS = r'''
+const target = document.querySelector(arguments[0]);
+if (!target) return false;
+if (window.__wmObserver && window.__wmTarget === target) return true;
+if (window.__wmObserver) window.__wmObserver.disconnect();
+window.__wmTarget = target;
+window.__wmChanged = true;
+window.__wmNotify = null;
+window.__wmObserver = new MutationObserver(() => {
+    window.__wmChanged = true;
+    if (window.__wmNotify) window.__wmNotify();
+});
+window.__wmObserver.observe(target, {childList: true});
+return true;
+'''
+
+# Long-poll: só responde quando houver mudança ou ao fim do prazo
+WAIT_CHANGE_JS = r'''
+const done = arguments[arguments.length - 1];
+if (!window.__wmObserver || !document.contains(window.__wmTarget)) {
+    done('detached');
+    return;
+}
+if (window.__wmChanged) {
+    window.__wmChanged = false;
+    done('changed');
+    return;
+}
+const timer = setTimeout(() => {
+    window.__wmNotify = null;
+    done('timeout');
+}, arguments[0]);
+window.__wmNotify = () => {
+    clearTimeout(timer);
+    window.__wmNotify = null;
+    window.__wmChanged = false;
+    done('changed');
+};
+'''
+
+
+def _hash(text: str) -> str:
+    return hashlib.blake2b(text.encode('utf8'), digest_size=16).hexdigest()
+
+
+class CardScanner:
+    """
+    Mantém uma impressão digital de cada card do painel para ler e
+    interpretar apenas os cards novos ou alterados desde a última passada.
+
+    No modo por elementos, a referência do elemento (WebElement.id) vem
+    junto com o find_elements, sem custo extra. Enquanto a lista de
+    referências for a mesma da última leitura (mesmos nós, na mesma ordem),
+    nenhum .text é lido, salvo a releitura completa a cada FULL_READ_EVERY
+    leituras. Quando um card entra, sai ou muda de lugar o painel pode ter
+    reaproveitado nós antigos para outros pedidos, então todos os textos
+    são relidos, mas só os textos com hash desconhecido são interpretados.
+
+    No modo por script os cards já chegam estruturados e a impressão
+    digital é o código do pedido junto com o conteúdo do card.
+    """
+
+    def __init__(self, full_read_every: int = FULL_READ_EVERY):
+        self.full_read_every = full_read_every
+        self._reads_since_full = 0
+        self._refs: dict[str, str] = {}
+        self._parsed: dict[str, list[str]] = {}
+        self.last_parsed = 0
+        self.last_skipped = 0
+        self.total_parsed = 0
+        self.total_skipped = 0
+
+    def scan(self, elements) -> list[str]:
+        """
+        Retorna os telefones de todos os cards na ordem em que aparecem
+        """
+        refs = [element.id for element in elements]
+        self._reads_since_full += 1
+        read_texts = (refs != list(self._refs)
+                      or self._reads_since_full >= self.full_read_every)
+        if read_texts:
+            self._reads_since_full = 0
+
+        pending = {}
+        current_refs = {}
+        for ref, element in zip(refs, elements):
+            if not read_texts:
+                current_refs[ref] = self._refs[ref]
+                continue
+
+            text = element.text
+            fingerprint = _hash(text)
+            current_refs[ref] = fingerprint
+            if fingerprint not in self._parsed:
+                pending[fingerprint] = text
+
+        self._refs = current_refs
+        self._parse(pending)
+        return self._collect(list(current_refs.values()), len(pending))
+
+    def scan_cards(self, cards: list[dict]) -> list[str]:
+        """
+        Igual ao scan, mas para os cards estruturados do EXTRACT_CARDS_JS
+        ou para os pedidos lidos da rede
+        """
+        pending = {}
+        parsed = 0
+        fingerprints = []
+        for card in cards:
+            fingerprint = _hash('\x1f'.join(
+                str(card.get(key) or '')
+                for key in ('id', 'name', 'phone', 'status', 'text')
+            ))
+            fingerprints.append(fingerprint)
+            if fingerprint in self._parsed or fingerprint in pending:
+                continue
+            parsed += 1
+            phone = card.get('phone') or ''
+            if phone.isdecimal():
+                # Vindo da rede o telefone já chega limpo
+                self._parsed[fingerprint] = [phone]
+            else:
+                pending[fingerprint] = phone or card.get('text') or ''
+
+        self._refs = {}
+        self._parse(pending)
+        return self._collect(fingerprints, parsed)
+
+    def _parse(self, pending: dict[str, str]) -> None:
+        # Todos os textos novos passam pela regex de uma vez
+        phones = extract_phones_batch(list(pending.values()))
+        self._parsed.update(zip(pending.keys(), phones))
+
+    def _collect(self, fingerprints: list[str], parsed: int) -> list[str]:
+        # Descarta o que já saiu do painel para o cache não crescer
+        current = set(fingerprints)
+        self._parsed = {
+            key: value for key, value in self._parsed.items()
+            if key in current
+        }
+
+        self.last_parsed = parsed
+        self.last_skipped = len(fingerprints) - parsed
+        self.total_parsed += parsed
+        self.total_skipped += self.last_skipped
+        return [
+            phone
+            for fingerprint in fingerprints
+            for phone in self._parsed[fingerprint]
+        ]
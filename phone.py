@@ -0,0 +1,150 @@
+import re
+from bisect import bisect_right
+
+# Mesmo padrão é usado no navegador (EXTRACT_CARDS_JS), por isso não usa
+# recursos exclusivos do Python.
+# Aceita (85) 98164-7142, (85)98164-7142, (85) 9 8164-7142, 85 98164-7142,
+# +55 85 98164-7142, 5585981647142 e fixos como (85) 3212-3456. Só dígitos
+# corridos não bastam (um código de pedido ou valor com dígitos suficientes
+# viraria telefone): é preciso o DDD entre parênteses, um separador antes
+# dos 4 últimos dígitos ou o 55 do país. Os espaços não atravessam linhas
+# para não juntar números de linhas diferentes.
+_SPACE = r'[ \t\u00a0]*'
+_COUNTRY = rf'(?:\+?{_SPACE}55{_SPACE})?'
+_PREFIX = rf'(9{_SPACE}\d{{4}}|[2-5]\d{{3}})'
+PHONE_PATTERN = (
+    r'(?<!\d)(?:'
+    # (85) 98164-7142
+    rf'{_COUNTRY}\({_SPACE}([1-9][1-9]){_SPACE}\){_SPACE}[.-]?{_SPACE}'
+    rf'{_PREFIX}{_SPACE}[.-]?{_SPACE}(\d{{4}})'
+    # 85 98164-7142, 85 98164 7142
+    rf'|{_COUNTRY}([1-9][1-9]){_SPACE}[.-]?{_SPACE}{_PREFIX}'
+    rf'(?:[ \t\u00a0]+|{_SPACE}[.-]{_SPACE})(\d{{4}})'
+    # 5585981647142
+    r'|\+?55([1-9][1-9])(9\d{4}|[2-5]\d{3})(\d{4})'
+    r')(?!\d)'
+)
+PHONE_RE = re.compile(PHONE_PATTERN)
+
+# Primeira passada barata: trechos que podem conter um telefone. Começa por
+# uma classe de caracteres, o que permite ao re pular o resto do texto
+# rapidamente; só esses trechos passam pela regex completa, o que deixa a
+# extração com cerca de metade do tempo (python phone.py mostra os dois).
+_CANDIDATE_RE = re.compile(r'[(+\d][\d \t\u00a0().+-]{9,}')
+
+# Separa os textos no modo em lote; não aparece no texto dos cards
+_SEPARATOR = '\x00'
+
+
+def _matches(text: str):
+    for candidate in _CANDIDATE_RE.finditer(text):
+        for match in PHONE_RE.finditer(candidate.group()):
+            yield candidate.start() + match.start(), match
+
+
+def _full_scan(text: str):
+    # Só a regex completa, sem a primeira passada; usado na comparação
+    for match in PHONE_RE.finditer(text):
+        yield match.start(), match
+
+
+def _digits(match: re.Match) -> str:
+    # Cada formato tem o seu trio de grupos (DDD, prefixo, final)
+    groups = match.groups()
+    i = 0 if groups[0] else 3 if groups[3] else 6
+    ddd, prefix, suffix = groups[i:i + 3]
+    if len(prefix) > 4:
+        # Remove o espaço de formatos como "9 8164-7142"
+        prefix = prefix[0] + prefix[-4:]
+    return ddd + prefix + suffix
+
+
+def normalize_phone(phone_number: str) -> str:
+    """
+    Só os dígitos, sem o 55 do país, para o mesmo contato sempre cair na
+    mesma chave
+    """
+    digits = ''.join(c for c in str(phone_number) if c.isdigit())
+    if len(digits) > 11 and digits.startswith('55'):
+        digits = digits[2:]
+    return digits
+
+
+def extract_phones(text: str) -> list[str]:
+    """
+    Retorna os telefones do texto (DDD + número, só dígitos), sem repetir
+    """
+    return list(dict.fromkeys(_digits(m) for _, m in _matches(text)))
+
+
+def extract_phones_batch(texts: list[str]) -> list[list[str]]:
+    """
+    Igual ao extract_phones para vários textos, com uma única passada da
+    regex sobre todos eles
+    """
+    offsets = []
+    position = 0
+    for text in texts:
+        offsets.append(position)
+        position += len(text) + 1
+
+    result = [[] for _ in texts]
+    for start, match in _matches(_SEPARATOR.join(texts)):
+        phones = result[bisect_right(offsets, start) - 1]
+        phone = _digits(match)
+        if phone not in phones:
+            phones.append(phone)
+    return result
+
+
+def _legacy_extract(card_text: str) -> list[str]:
+    # Lógica antiga do wait_element, mantida só para comparação
+    phones = []
+    for line in card_text.split('\n'):
+        if '(' in line and ')' in line:
+            init = line.index('(')
+            end = init + 15
+            phone_number = line[init:end]
+            phones.append(''.join([i for i in phone_number if i.isdecimal()]))
+    return phones
+
+
+if __name__ == '__main__':
+    import json
+    import timeit
+
+    from utils import STANDIN_DIR
+
+    with open(STANDIN_DIR / 'payloads' / 'cards.json', 'r',
+              encoding='utf8') as file:
+        corpus = json.load(file)
+    texts = [card['text'] for card in corpus]
+
+    for name, extract in (('antigo', _legacy_extract),
+                          ('regex', extract_phones)):
+        hits = sum(extract(card['text']) == card['phones'] for card in corpus)
+        print(f'{name}: {hits}/{len(corpus)} cards corretos')
+
+    batch_hits = sum(
+        phones == card['phones']
+        for phones, card in zip(extract_phones_batch(texts), corpus)
+    )
+    print(f'lote: {batch_hits}/{len(corpus)} cards corretos')
+
+    # Dígitos corridos sem formato de telefone não contam
+    for text in ('Pedido 85996543210', 'Código 48211234567',
+                 'Total R$ 8599654321'):
+        assert not extract_phones(text), text
+
+    dashboard = texts * (200 // len(texts) + 1)
+    runs = 200
+    for name, function in (
+        ('antigo', lambda: [_legacy_extract(t) for t in dashboard]),
+        ('regex sem pré-filtro', lambda: [
+            [_digits(m) for _, m in _full_scan(t)] for t in dashboard]),
+        ('regex', lambda: [extract_phones(t) for t in dashboard]),
+        ('lote', lambda: extract_phones_batch(dashboard)),
+    ):
+        seconds = timeit.timeit(function, number=runs) / runs
+        print(f'{name}: {seconds * 1000:.3f} ms por painel com '
+              f'{len(dashboard)} cards')
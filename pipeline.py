@@ -0,0 +1,123 @@
+import queue
+import threading
+from typing import TYPE_CHECKING, Optional
+
+from log import LogFileMixin
+from tracing import TRACER
+
+if TYPE_CHECKING:
+    from whatsapp import Whatsapp
+    from whatsmenu import Whatsmenu
+
+# Pedidos aguardando envio; com a fila cheia o Whatsmenu segura os números
+# no próprio agendador e continua lendo o painel
+QUEUE_MAXSIZE = 20
+
+
+class OrderPipeline(LogFileMixin):
+    """
+    Separa a leitura do painel do envio no WhatsApp. A etapa de leitura
+    (Whatsmenu.start) roda em uma thread e coloca os números em uma fila
+    limitada; a etapa de envio roda em outra thread e chama
+    Whatsapp.check_number para cada número da fila, a partir do momento em
+    que Whatsapp.ready é sinalizado. Cada navegador continua sendo usado
+    por uma única thread.
+    """
+
+    def __init__(self, whatsapp: 'Whatsapp', whatsmenu: 'Whatsmenu',
+                 maxsize: int = QUEUE_MAXSIZE):
+        self.whatsapp = whatsapp
+        self.whatsmenu = whatsmenu
+        self.log_on = whatsapp.log_on
+        self.orders = queue.Queue(maxsize)
+        self.whatsmenu.orders = self.orders
+        self.stop_event = threading.Event()
+        self.max_depth = 0
+        self.sent = 0
+        self.scan_error: Optional[Exception] = None
+        self.scanner_thread = threading.Thread(
+            target=self._scan, name='whatsmenu-scanner', daemon=True)
+        self.sender_thread = threading.Thread(
+            target=self._send, name='whatsapp-sender', daemon=True)
+
+    def start(self) -> None:
+        self.scanner_thread.start()
+        self.sender_thread.start()
+
+    def stop(self) -> None:
+        # O sinal do WhatsApp interrompe o pedido em andamento, a
+        # recuperação e a espera pelo login
+        self.stop_event.set()
+        self.whatsmenu.window_signal = True
+        self.whatsapp.window_signal = True
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        self.scanner_thread.join(timeout)
+        self.sender_thread.join(timeout)
+
+    def running(self) -> bool:
+        """
+        Alguma das duas threads ainda não terminou
+        """
+        return self.scanner_thread.is_alive() or self.sender_thread.is_alive()
+
+    def depth(self) -> int:
+        return self.orders.qsize()
+
+    def is_alive(self) -> bool:
+        """
+        Ativo enquanto o painel é lido ou ainda há pedidos para enviar
+        """
+        return self.sender_thread.is_alive() and (
+            self.scanner_thread.is_alive() or not self.orders.empty())
+
+    def _scan(self) -> None:
+        try:
+            self.whatsmenu.start()
+        except Exception as e:
+            self.scan_error = e
+            self.log_error(f'Scanner stopped: {e.__class__.__name__}')
+        else:
+            self.log_success('Scanner stopped')
+
+    def _send(self) -> None:
+        # Os pedidos ficam na fila até o WhatsApp Web terminar de carregar
+        while not self.whatsapp.ready.wait(timeout=1):
+            if self.stop_event.is_set() or not self.scanner_thread.is_alive():
+                self.whatsmenu.checked.flush()
+                return
+
+        while not self.stop_event.is_set():
+            try:
+                phone_number = self.orders.get(timeout=1)
+            except queue.Empty:
+                if not self.scanner_thread.is_alive():
+                    break
+                continue
+
+            TRACER.mark(phone_number, 'queue')
+            outcome = 'error'
+            try:
+                outcome = self.whatsapp.check_number(phone_number)
+                self.sent += 1
+            except Exception as e:
+                self.log_error(f'Sender {phone_number} '
+                               f'{e.__class__.__name__}')
+            finally:
+                if outcome == 'stopped':
+                    # Parado pelo OFF antes de abrir a conversa: o pedido
+                    # volta a ser lido no próximo ON
+                    self.whatsmenu.in_flight.discard(phone_number)
+                else:
+                    self.whatsmenu.mark_checked(phone_number)
+                self.orders.task_done()
+
+        self.whatsmenu.checked.flush()
+
+    def update_depth(self) -> int:
+        """
+        Lê a profundidade atual da fila e guarda o pico
+        """
+        depth = self.depth()
+        self.max_depth = max(self.max_depth, depth)
+        return depth
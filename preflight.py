@@ -0,0 +1,110 @@
+import json
+import time
+from pathlib import Path
+from typing import Optional
+
+import requests
+
+from http_orders import (HttpOrderSource, OrdersUnavailable, SessionExpired,
+                         load_session)
+from utils import (PROFILE_WHATSAPP_PATH, PROFILE_WHATSMENU_PATH,
+                   SESSION_WHATSMENU_PATH)
+
+LOGGED_IN = 'logged_in'
+LOGIN_NEEDED = 'login_needed'
+UNKNOWN = 'unknown'
+
+# Gravado ao lado do perfil com o resultado da última verificação de login
+LOGIN_STATE_NAME = 'login_state.json'
+# Tempo máximo da consulta HTTP que confirma a sessão do Whatsmenu
+PROBE_TIMEOUT = 3
+
+# Onde o WhatsApp Web guarda as chaves da sessão dentro do perfil
+WHATSAPP_SESSION_DIRS = (
+    Path('Default', 'IndexedDB',
+         'https_web.whatsapp.com_0.indexeddb.leveldb'),
+)
+
+
+def _state_path(profile) -> Path:
+    return Path(profile).parent / LOGIN_STATE_NAME
+
+
+def record_login_state(profile, logged_in: bool) -> None:
+    """
+    Guarda o resultado da verificação de login do perfil. No próximo start
+    um perfil marcado como deslogado já abre visível, sem o headless antes.
+    """
+    path = _state_path(profile)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf8') as file:
+            json.dump({'logged_in': logged_in, 'checked_at': time.time()},
+                      file)
+    except OSError as e:
+        print('login state', e.__class__.__name__)
+
+
+def _recorded_login_state(profile) -> Optional[bool]:
+    try:
+        with open(_state_path(profile), 'r', encoding='utf8') as file:
+            return bool(json.load(file)['logged_in'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def whatsapp_login_state(profile=PROFILE_WHATSAPP_PATH) -> str:
+    """
+    Decide pelo perfil, sem abrir o Chrome, se o WhatsApp Web vai pedir o
+    QR Code. UNKNOWN significa que só carregando a página para saber.
+
+    Um perfil com a sessão que expirou no servidor continua UNKNOWN: o
+    Chrome abre em headless, encontra o QR Code e reabre visível (duas
+    aberturas). Essa verificação grava o perfil como deslogado, então só
+    o start seguinte abre visível direto.
+    """
+    profile = Path(profile)
+    if not any((profile / folder).is_dir()
+               for folder in WHATSAPP_SESSION_DIRS):
+        return LOGIN_NEEDED
+    if _recorded_login_state(profile) is False:
+        return LOGIN_NEEDED
+    return UNKNOWN
+
+
+def whatsmenu_login_state(base_url: str, profile=PROFILE_WHATSMENU_PATH,
+                          session_path=SESSION_WHATSMENU_PATH) -> str:
+    """
+    Decide pela sessão salva se o Whatsmenu vai pedir login. Quando o
+    endpoint real dos pedidos já é conhecido, confirma com uma consulta
+    HTTP curta; sem ele a resposta não é confiável e fica UNKNOWN. O
+    endpoint é salvo junto com a sessão em qualquer modo de extração, a
+    partir do primeiro start logado.
+    """
+    if not Path(profile).is_dir():
+        return LOGIN_NEEDED
+    if _recorded_login_state(profile) is False:
+        return LOGIN_NEEDED
+
+    session = load_session(session_path)
+    if not session or not session.get('cookies'):
+        return UNKNOWN
+
+    expiries = [cookie['expiry'] for cookie in session['cookies']
+                if 'expiry' in cookie]
+    if expiries and max(expiries) < time.time():
+        return LOGIN_NEEDED
+    if not session.get('endpoint'):
+        return UNKNOWN
+
+    source = HttpOrderSource(base_url, session['cookies'],
+                             session['endpoint'], timeout=PROBE_TIMEOUT)
+    try:
+        source.fetch()
+    except SessionExpired:
+        return LOGIN_NEEDED
+    except (OrdersUnavailable, requests.RequestException):
+        return UNKNOWN
+    finally:
+        source.close()
+    return LOGGED_IN
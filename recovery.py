@@ -0,0 +1,80 @@
+import time
+from typing import Callable, Optional
+
+from metrics import Timings
+
+# Tentativas de cada passo antes de passar para o seguinte
+RECOVERY_ATTEMPTS = 2
+# Espera entre tentativas: começa em BACKOFF_SECONDS e dobra a cada uma,
+# até BACKOFF_MAX
+BACKOFF_SECONDS = 0.5
+BACKOFF_MAX = 4.0
+
+
+class RecoveryFailed(Exception):
+    """
+    Nenhum passo da recuperação deixou a página utilizável
+    """
+
+
+class Recovery:
+    """
+    Recuperação em passos cada vez mais caros (por exemplo: voltar,
+    reiniciar a tela, recarregar a página, reabrir o navegador). Cada
+    passo tem um número limitado de tentativas, com espera exponencial
+    entre elas, e depois de cada tentativa healthy diz se a página voltou.
+    Um incidente termina sempre: recuperado ou com RecoveryFailed.
+    """
+
+    def __init__(self, steps: list[tuple[str, Callable[[], None]]],
+                 healthy: Callable[[], bool],
+                 should_stop: Callable[[], bool] = lambda: False,
+                 attempts: int = RECOVERY_ATTEMPTS,
+                 backoff: float = BACKOFF_SECONDS,
+                 max_backoff: float = BACKOFF_MAX,
+                 timings: Optional[Timings] = None, sleep=time.sleep):
+        self.steps = steps
+        self.healthy = healthy
+        self.should_stop = should_stop
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timings = timings if timings is not None else Timings()
+        self.sleep = sleep
+        self.incidents = 0
+        self.failures = 0
+
+    def recover(self, first_step: Optional[str] = None) -> tuple[str, float]:
+        """
+        Executa os passos a partir de first_step até a página voltar.
+        Retorna o passo que resolveu e a duração do incidente.
+        """
+        self.incidents += 1
+        start = time.perf_counter()
+        names = [name for name, _ in self.steps]
+        first = names.index(first_step) if first_step in names else 0
+        tries = 0
+        errors = []
+        for name, step in self.steps[first:]:
+            for _ in range(self.attempts):
+                if self.should_stop():
+                    return self._failed(start, 'stopped')
+                if tries:
+                    self.sleep(min(self.backoff * 2 ** (tries - 1),
+                                   self.max_backoff))
+                tries += 1
+                try:
+                    step()
+                    if self.healthy():
+                        seconds = time.perf_counter() - start
+                        self.timings.add(f'recovery.{name}', seconds)
+                        return name, seconds
+                except Exception as e:
+                    errors.append(f'{name}:{e.__class__.__name__}')
+        return self._failed(start, ', '.join(errors) or 'not healthy')
+
+    def _failed(self, start: float, detail: str):
+        seconds = time.perf_counter() - start
+        self.failures += 1
+        self.timings.add('recovery.failed', seconds)
+        raise RecoveryFailed(f'{detail} ({seconds:.1f}s)')
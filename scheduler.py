@@ -0,0 +1,57 @@
+import heapq
+import itertools
+import time
+from typing import Optional
+
+
+class DelayScheduler:
+    """
+    Fila de espera dos pedidos ordenada pelo horário em que cada um vence.
+    O prazo de cada pedido começa quando ele é visto pela primeira vez,
+    então vários pedidos que chegam juntos vencem juntos em vez de um
+    esperar o prazo do outro.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._heap: list[tuple[float, int, str]] = []
+        self._pending: set[str] = set()
+        self._counter = itertools.count()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._pending
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def schedule(self, key: str, delay: float) -> bool:
+        """
+        Agenda key para daqui a delay segundos. Retorna False se já estava
+        agendada (o prazo original é mantido).
+        """
+        if key in self._pending:
+            return False
+        self._pending.add(key)
+        heapq.heappush(
+            self._heap, (self.clock() + delay, next(self._counter), key))
+        return True
+
+    def pop_due(self) -> list[str]:
+        """
+        Retira e retorna, na ordem de vencimento, tudo que já venceu
+        """
+        now = self.clock()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, key = heapq.heappop(self._heap)
+            self._pending.discard(key)
+            due.append(key)
+        return due
+
+    def next_due_in(self) -> Optional[float]:
+        """
+        Segundos até o próximo vencimento, ou None se a fila está vazia
+        """
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self.clock())
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from phone import normalize_phone
+from utils import STANDIN_DIR
+
+FIRST_NAMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Elaine', 'Fábio', 'Gisele',
+               'Hugo', 'Iara', 'José', 'Larissa', 'Marcos', 'Natália']
+LAST_NAMES = ['Almeida', 'Barbosa', 'Costa', 'Ferreira', 'Lima', 'Oliveira',
+              'Ribeiro', 'Rocha', 'Santos', 'Silva']
+
+
+def contact_title(phone_number: str, ninth_digit: bool = False) -> str:
+    """
+    Como o WhatsApp mostra o número: +55 85 9123-4567, ou com o nono
+    dígito (+55 85 99123-4567)
+    """
+    digits = normalize_phone(phone_number)
+    if len(digits) == 11 and not ninth_digit:
+        digits = digits[:2] + digits[3:]
+    return f'+55 {digits[:2]} {digits[2:-4]}-{digits[-4:]}'
+
+
+class StandinServer:
+    """
+    Servidor local que imita o painel do Whatsmenu para testes sem tocar em
+    clientes reais. Serve o painel em /dashboard/request e os pedidos
+    gravados em /api/requests, que podem receber pedidos novos com
+    add_orders, além de uma conversa do WhatsApp em /chat e de um
+    WhatsApp Web em /whatsapp/ (lista, "Nova conversa", busca, links de
+    envio e conversas). Todo número existe no WhatsApp, com o título sem
+    o nono dígito, salvo o que for definido em set_contact.
+    """
+
+    def __init__(self, port: int = 0,
+                 payload_path=STANDIN_DIR / 'payloads' / 'requests.json'):
+        with open(payload_path, 'r', encoding='utf8') as file:
+            self.orders = json.load(file)['data']
+        self.lock = threading.Lock()
+        # Quando definido, /api/requests exige este cookie (sessão)
+        self.session_cookie = None
+        # Demora (s) do WhatsApp de teste para achar um contato e para o
+        # balão da mensagem enviada aparecer
+        self.whatsapp_delay = 0.1
+        self.contacts: dict[str, dict] = {}
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port),
+                                         self._handler())
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def add_orders(self, count: int,
+                   phones: Optional[list[str]] = None) -> list[dict]:
+        """
+        Cria count pedidos novos com os telefones informados ou aleatórios
+        """
+        new_orders = []
+        with self.lock:
+            last = self.orders[-1] if self.orders else {'id': 0, 'code': 0}
+            for i in range(1, count + 1):
+                phone = (phones[i - 1] if phones else
+                         f'55859{random.randint(0, 99999999):08}')
+                new_orders.append({
+                    'id': last['id'] + i,
+                    'code': last['code'] + i,
+                    'status': 'production',
+                    'type': 'D',
+                    'total': round(random.uniform(20, 150), 2),
+                    'client': {
+                        'id': random.randint(1, 9999),
+                        'name': f'{random.choice(FIRST_NAMES)} '
+                                f'{random.choice(LAST_NAMES)}',
+                        'whatsapp': phone,
+                    },
+                })
+            self.orders.extend(new_orders)
+        return new_orders
+
+    def set_contact(self, phone: str, on_whatsapp: bool = True,
+                    ordered_today: bool = False,
+                    ninth_digit: bool = False) -> None:
+        """
+        Como o número aparece no WhatsApp de teste: se existe, se já tem a
+        mensagem com o código do pedido hoje e se o título tem o nono
+        dígito
+        """
+        with self.lock:
+            self.contacts[normalize_phone(phone)] = {
+                'on_whatsapp': on_whatsapp, 'ordered_today': ordered_today,
+                'ninth_digit': ninth_digit,
+            }
+
+    def routes(self) -> dict:
+        """
+        Rotas GET -> função que recebe o request e devolve
+        (status, headers, corpo)
+        """
+        return {
+            # Simula uma sessão já logada: o login cai direto no painel
+            '/auth/login': self._dashboard,
+            '/dashboard/request': self._dashboard,
+            '/api/requests': self._requests,
+            '/chat': self._chat,
+            '/whatsapp/': self._whatsapp,
+            '/whatsapp/contact': self._whatsapp_contact,
+        }
+
+    def _dashboard(self, request):
+        body = (STANDIN_DIR / 'dashboard.html').read_bytes()
+        return 200, {'Content-Type': 'text/html; charset=utf-8'}, body
+
+    def _chat(self, request):
+        body = (STANDIN_DIR / 'chat.html').read_bytes()
+        return 200, {'Content-Type': 'text/html; charset=utf-8'}, body
+
+    def _whatsapp(self, request):
+        body = (STANDIN_DIR / 'whatsapp.html').read_text(encoding='utf8')
+        body = body.replace('__DELAY__',
+                            str(int(self.whatsapp_delay * 1000)))
+        return (200, {'Content-Type': 'text/html; charset=utf-8'},
+                body.encode('utf8'))
+
+    def _whatsapp_contact(self, request):
+        query = parse_qs(urlsplit(request.path).query)
+        digits = normalize_phone(query.get('phone', [''])[0])
+        time.sleep(self.whatsapp_delay)
+        with self.lock:
+            contact = self.contacts.get(digits, {})
+        exists = len(digits) in (10, 11) and contact.get('on_whatsapp', True)
+        title = contact_title(digits, contact.get('ninth_digit', False))
+        rows = ['ONTEM', 'Oi, tudo bem?']
+        if contact.get('ordered_today', False):
+            rows += ['HOJE', 'Código do pedido: #1024\n'
+                             'https://www.whatsmenu.com.br/pedido/1024']
+        body = json.dumps({'exists': exists, 'title': title, 'rows': rows},
+                          ensure_ascii=False).encode('utf8')
+        return 200, {'Content-Type': 'application/json; charset=utf-8'}, body
+
+    def _requests(self, request):
+        if (self.session_cookie and
+                self.session_cookie not in request.headers.get('Cookie', '')):
+            return 401, {}, b''
+
+        with self.lock:
+            body = json.dumps({'data': self.orders}, ensure_ascii=False)
+        body = body.encode('utf8')
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if request.headers.get('If-None-Match') == etag:
+            return 304, {'ETag': etag}, b''
+        headers = {'Content-Type': 'application/json; charset=utf-8',
+                   'ETag': etag}
+        return 200, headers, body
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                route = server.routes().get(self.path.split('?')[0])
+                if route is None:
+                    self.send_error(404)
+                    return
+                status, headers, body = route(self)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                ...
+
+        return Handler
+
+
+if __name__ == '__main__':
+    server = StandinServer(port=8765)
+    server.start()
+    print(f'Painel de teste em {server.url}/dashboard/request')
+    try:
+        while input('Enter adiciona um pedido, "q" sai: ') != 'q':
+            print(server.add_orders(1))
+    finally:
+        server.stop()
@@ -0,0 +1,154 @@
+import datetime
+import json
+import math
+import threading
+import time
+from typing import Optional
+
+from utils import TRACES_PATH
+
+# Etapas de cada pedido, na ordem em que acontecem:
+# grace: do pedido aparecer no painel até vencer o tempo de espera
+# queue: esperando na fila até a etapa de envio pegar o número
+# open: abrir a conversa e confirmar o cabeçalho
+# history: procurar o código do pedido nas mensagens de hoje
+# typed: inserir o texto na caixa de mensagem
+# sent: do Enter até o balão da mensagem aparecer
+STAGES = ('grace', 'queue', 'open', 'history', 'typed', 'sent')
+
+
+class OrderTracer:
+    """
+    Tempos de cada pedido, do momento em que o telefone aparece no painel
+    até a mensagem aparecer como enviada no WhatsApp. Cada mark registra o
+    tempo desde a marcação anterior do mesmo pedido; no finish o pedido é
+    gravado como uma linha JSON em traces.jsonl.
+    """
+
+    def __init__(self, path=TRACES_PATH, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self.lock = threading.Lock()
+        self._orders: dict[str, dict] = {}
+
+    def seen(self, phone_number: str) -> None:
+        """
+        O pedido apareceu no painel; os demais tempos contam a partir daqui
+        """
+        now = self.clock()
+        with self.lock:
+            self._orders.setdefault(phone_number, {
+                'phone': phone_number, 'seen_at': now, 'last': now,
+                'spans': {},
+            })
+
+    def mark(self, phone_number: Optional[str], stage: str) -> None:
+        now = self.clock()
+        with self.lock:
+            order = self._orders.get(phone_number)
+            if order is None:
+                return
+            spans = order['spans']
+            spans[stage] = spans.get(stage, 0.0) + now - order['last']
+            order['last'] = now
+
+    def finish(self, phone_number: str, outcome: str) -> None:
+        now = self.clock()
+        with self.lock:
+            order = self._orders.pop(phone_number, None)
+        if order is None:
+            return
+        record = {
+            'phone': phone_number,
+            'day': datetime.date.fromtimestamp(order['seen_at']).isoformat(),
+            'seen_at': round(order['seen_at'], 3),
+            'outcome': outcome,
+            'spans': {stage: round(seconds, 3)
+                      for stage, seconds in order['spans'].items()},
+            'total': round(now - order['seen_at'], 3),
+        }
+        try:
+            with open(self.path, 'a', encoding='utf8') as file:
+                file.write(json.dumps(record) + '\n')
+        except OSError as e:
+            print('traces', e.__class__.__name__)
+
+
+def percentile(values: list[float], p: float) -> float:
+    """
+    Percentil pelo método nearest-rank (values já ordenado)
+    """
+    rank = max(1, math.ceil(p / 100 * len(values)))
+    return values[rank - 1]
+
+
+def stage_percentiles(path=TRACES_PATH, day: Optional[str] = None
+                      ) -> tuple[dict[str, int], dict[str, dict]]:
+    """
+    Quantos pedidos de um dia (hoje se day não for informado) terminaram
+    de cada jeito e n/p50/p95/p99 de cada etapa e do total
+    """
+    day = day or datetime.date.today().isoformat()
+    values: dict[str, list[float]] = {}
+    outcomes: dict[str, int] = {}
+    try:
+        with open(path, 'r', encoding='utf8') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('day') != day:
+                    continue
+                outcomes[record['outcome']] = (
+                    outcomes.get(record['outcome'], 0) + 1)
+                for stage, seconds in record['spans'].items():
+                    values.setdefault(stage, []).append(seconds)
+                values.setdefault('total', []).append(record['total'])
+    except FileNotFoundError:
+        pass
+
+    stages = {}
+    if not values:
+        return outcomes, stages
+    known = [stage for stage in STAGES if stage in values]
+    others = sorted(set(values) - set(STAGES) - {'total'})
+    for stage in known + others + ['total']:
+        stage_values = sorted(values[stage])
+        stages[stage] = {'n': len(stage_values), **{
+            f'p{p}': percentile(stage_values, p) for p in (50, 95, 99)}}
+    return outcomes, stages
+
+
+def summarize(path=TRACES_PATH, day: Optional[str] = None) -> str:
+    """
+    p50/p95/p99 de cada etapa e do total para os pedidos de um dia
+    (hoje se day não for informado)
+    """
+    day = day or datetime.date.today().isoformat()
+    outcomes, stages = stage_percentiles(path, day)
+    if not stages:
+        return f'{day}: nenhum pedido registrado'
+
+    lines = [f'{day}: {sum(outcomes.values())} pedidos '
+             f'({", ".join(f"{k}={v}" for k, v in sorted(outcomes.items()))})',
+             f'{"etapa":<8} {"n":>5} {"p50":>8} {"p95":>8} {"p99":>8}']
+    for stage, stat in stages.items():
+        lines.append(
+            f'{stage:<8} {stat["n"]:>5} '
+            + ' '.join(f'{stat[p]:>7.2f}s' for p in ('p50', 'p95', 'p99')))
+    return '\n'.join(lines)
+
+
+TRACER = OrderTracer()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Resumo dos tempos por pedido (traces.jsonl)')
+    parser.add_argument('--day', help='dia no formato AAAA-MM-DD (hoje)')
+    parser.add_argument('--path', default=TRACES_PATH)
+    args = parser.parse_args()
+    print(summarize(args.path, args.day))
@@ -3,9 +3,16 @@ from pathlib import Path
 ROOT_DIR = Path(__file__).parent
 PROFILE_WHATSAPP_PATH = ROOT_DIR / 'profile_whatsapp' / 'wpp'
 PROFILE_WHATSMENU_PATH = ROOT_DIR / 'profile_whatsmenu' / 'whatsmenu'
+SESSION_WHATSMENU_PATH = ROOT_DIR / 'profile_whatsmenu' / 'session.json'
 SETTINGS_PROFILE_PATH = ROOT_DIR / 'settings.json'
 WINDOW_ICON_PATH = ROOT_DIR / 'icon' / 'hamburguer.ico'
 FILE_LOG = ROOT_DIR / 'log.txt'
+CHECKED_JOURNAL_PATH = ROOT_DIR / 'checked_journal.txt'
+CONTACTS_JOURNAL_PATH = ROOT_DIR / 'contacts_journal.txt'
+TRACES_PATH = ROOT_DIR / 'traces.jsonl'
+STANDIN_DIR = ROOT_DIR / 'standin'
+WHATSMENU_URL = 'https://next.whatsmenu.com.br'
+WHATSAPP_URL = 'https://web.whatsapp.com'
 
 
 STYLE = '''
@@ -1,9 +1,10 @@
 import datetime
 import os
 import shutil
+import threading
 import time
+from typing import Optional
 
-from selenium import webdriver
 from selenium.common.exceptions import (ElementClickInterceptedException,
                                         NoSuchElementException,
                                         TimeoutException, WebDriverException)
@@ -11,59 +12,243 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.support import expected_conditions
 from selenium.webdriver.support.wait import WebDriverWait
 
+from commands import CommandRecorder, instrument
+from compose import insert_text
+from contacts import REVALIDATE, UNRESOLVABLE, ContactCache
+from drivers import DRIVERS, DriverPool
+from locators import SelectorRegistry
 from log import LogFileMixin
-from utils import PROFILE_WHATSAPP_PATH
+from metrics import Stopwatch, Timings
+from phone import normalize_phone
+from preflight import LOGIN_NEEDED, record_login_state, whatsapp_login_state
+from recovery import Recovery, RecoveryFailed
+from tracing import TRACER
+from utils import PROFILE_WHATSAPP_PATH, WHATSAPP_URL
 
 SELECTORS_NEW_CHAT = ['//*[@data-icon="new-chat-outline"]',]
 XPATH_SEARCH_BAR = '//*[@aria-label="Pesquisar nome ou número"]'
 XPATH_CHAT_ABSOLUTE = '//*[@id="app"]/div/div[3]/div/div[2]/div[1]/' \
     'span/div/span/div/div[2]/div[3]/div[2]/div[1]/div/span'
 XPATH_BACK_BUTTON = '//*[@data-icon="back-refreshed"]'
+# Caixa de mensagem, do seletor mais específico ao mais genérico
+SELECTORS_MESSAGE_BOX = [
+    '//*[@aria-placeholder="Digite uma mensagem"]',
+    '//div[@contenteditable="true"][@data-tab="10"]',
+    '//div[@role="textbox"]',
+    '//*[@contenteditable="true"]',
+]
+# Candidatos de cada papel para o SelectorRegistry
+SELECTORS = {
+    'new_chat': SELECTORS_NEW_CHAT,
+    'search_bar': [XPATH_SEARCH_BAR],
+    'back_button': [XPATH_BACK_BUTTON],
+    'message_box': SELECTORS_MESSAGE_BOX,
+}
+# Onde cada papel precisa estar: os candidatos genéricos da caixa de
+# mensagem também acham a busca da lateral
+SELECTOR_SCOPES = {
+    'message_box': '#main footer',
+}
+# Limite para a página mostrar a lista de conversas ou o QR Code
+LOGIN_CHECK_TIMEOUT = 60
+# Limites (s) de cada espera do envio; podem ser trocados pelo parâmetro
+# wait_timeouts do Whatsapp
+WAIT_TIMEOUTS = {
+    # Cabeçalho da conversa aberta pelo link mostrar o número
+    'chat_link': 5,
+    # Resultado da busca com o número aparecer e ficar clicável
+    'search': 10,
+    # Conversa aberta com o número no cabeçalho e a caixa de mensagem
+    'chat_ready': 10,
+    # Balão da mensagem enviada aparecer na conversa
+    'bubble': 10,
+    # Mensagens da conversa carregadas para procurar o código do pedido
+    'history': 10,
+    # Lista de conversas carregada depois do #side
+    'loaded': 15,
+    # Algum candidato de um papel do SelectorRegistry aparecer
+    'element': 10,
+    # Lista de conversas voltar depois de um passo da recuperação
+    'recovery': 5,
+}
+# Intervalo entre as verificações das esperas acima
+WAIT_POLL_SECONDS = 0.1
+
+NOT_ON_WHATSAPP = 'invalid'
+
+# O WhatsApp Web trata os cliques em links de envio dentro do #app
+# abrindo a conversa na própria página, como faz com links recebidos
+OPEN_CHAT_JS = """
+var link = document.createElement('a');
+link.href = 'https://api.whatsapp.com/send?phone=' + arguments[0];
+link.style.display = 'none';
+(document.getElementById('app') || document.body).appendChild(link);
+link.click();
+link.remove();
+"""
+
+# O título (da lista recebida) que o cabeçalho da conversa mostra,
+# NOT_ON_WHATSAPP quando o WhatsApp avisa que o número não existe, null
+# enquanto carrega
+CHAT_OPENED_JS = """
+var titles = arguments[0];
+var header = document.querySelector('#main header');
+for (var i = 0; header && i < titles.length; i++) {
+    if (header.querySelector('[title="' + titles[i] + '"]') ||
+            header.textContent.indexOf(titles[i]) >= 0) {
+        return titles[i];
+    }
+}
+var popup = document.querySelector('[data-animate-modal-popup="true"]');
+if (popup && /inv[aá]lid/i.test(popup.textContent)) {
+    return 'invalid';
+}
+return null;
+"""
+
+ORDER_CODE_MARKER = 'Código do pedido'
+WHATSMENU_MESSAGE_URL = 'www.whatsmenu.com.br'
+
+# Procura, da mensagem mais nova para trás, uma mensagem de hoje com o
+# código do pedido junto com o título configurado ou o link do whatsmenu.
+# Para no primeiro separador de dia: a busca custa só as mensagens de
+# hoje. Retorna null enquanto a conversa não tem mensagens carregadas.
+ORDER_CODE_SCAN_JS = """
+var title = arguments[0], marker = arguments[1], url = arguments[2];
+function isOrderCode(text) {
+    return text.indexOf(marker) >= 0 &&
+        (text.indexOf(url) >= 0 || (title && text.indexOf(title) >= 0));
+}
+var separator = /^([A-ZÀ-Ú-]+|\\d{1,2}\\/\\d{1,2}\\/\\d{2,4})$/;
+var rows = document.querySelectorAll('#main [role="row"]');
+if (rows.length) {
+    var position = -1;
+    for (var i = rows.length - 1; i >= 0; i--) {
+        var text = (rows[i].innerText || '').trim();
+        if (separator.test(text)) {
+            return {found: text === 'HOJE' && position >= 0,
+                    position: position, scanned: rows.length - i};
+        }
+        if (position < 0 && isOrderCode(text)) {
+            position = rows.length - 1 - i;
+        }
+    }
+    return {found: false, position: position, scanned: rows.length};
+}
+// Sem linhas: lê o texto das áreas de mensagens a partir do último HOJE
+var areas = document.querySelectorAll('#main .copyable-area');
+if (!areas.length) {
+    return null;
+}
+for (var j = areas.length - 1; j >= 0; j--) {
+    var areaText = areas[j].innerText || '';
+    var today = areaText.lastIndexOf('HOJE');
+    if (today >= 0) {
+        var found = isOrderCode(areaText.slice(today));
+        return {found: found, position: found ? 0 : -1,
+                scanned: areas.length - j};
+    }
+}
+return {found: false, position: -1, scanned: areas.length};
+"""
+
+# Balões de mensagens enviadas na conversa aberta
+COUNT_OUTGOING_JS = """
+return document.querySelectorAll('#main .message-out').length;
+"""
+
+
+def _login_screen(driver):
+    """
+    Condição do WebDriverWait: 'side' se logado, 'qr' se pede o QR Code
+    """
+    if driver.find_elements(By.ID, 'side'):
+        return 'side'
+    if driver.find_elements(By.XPATH, '//*/canvas'):
+        return 'qr'
+    return False
 
 
 class Whatsapp(LogFileMixin):
     def __init__(self, msg_title: str, automatic_msg: str,
-                 force_visible: bool = False, check_messages: bool = True):
-        self.options = Options()
-        self.options.add_argument(
-            r'user-data-dir={}'.format(PROFILE_WHATSAPP_PATH)
-        )
-        self.options.add_argument(r'--headless')
+                 force_visible: bool = False, check_messages: bool = True,
+                 open_mode: str = 'link', send_mode: str = 'bulk',
+                 wait_timeouts: Optional[dict] = None,
+                 record_commands: bool = False,
+                 base_url: str = WHATSAPP_URL,
+                 profile=PROFILE_WHATSAPP_PATH,
+                 drivers: Optional[DriverPool] = None,
+                 contacts: Optional[ContactCache] = None):
         self.force_visible = force_visible
         self.msg_title = msg_title
         self.automatic_msg = automatic_msg.split('\n')
         self.window_signal = False
         self.log = LogFileMixin()
-        self.driver = webdriver.Chrome(options=self.options)
+        # O Chrome só é aberto (ou reaproveitado) no start
+        self.driver = None
         self.active_start = False
         self.check_messages = check_messages
+        # 'link' abre a conversa pelo link de envio, 'search' pela busca
+        self.open_mode = open_mode
+        # 'bulk' manda a mensagem inteira de uma vez, 'lines' uma por linha
+        self.send_mode = send_mode
+        self.wait_timeouts = {**WAIT_TIMEOUTS, **(wait_timeouts or {})}
+        # Outro endereço e outro perfil permitem usar o WhatsApp de teste
+        # do standin.py sem tocar no perfil logado
+        self.base_url = base_url
+        self.profile = profile
+        # De onde vem o navegador; outro pool permite usar o FakeDriver
+        self.drivers = drivers if drivers is not None else DRIVERS
+        # Mede cada comando do WebDriver, somado por pedido
+        self.record_commands = record_commands
+        self.commands = CommandRecorder()
         self.login_needed = False
+        # Sinaliza que o WhatsApp Web está logado e pronto para enviar
+        self.ready = threading.Event()
+        self.timings = Timings()
+        self.current_phone = None
+        # O vencedor de cada papel vale enquanto este objeto existir
+        self.selectors = SelectorRegistry(SELECTORS, self.timings,
+                                          SELECTOR_SCOPES)
+        # Título que funcionou e números sem WhatsApp de cada contato,
+        # gravados em disco
+        self.contacts = contacts if contacts is not None else ContactCache()
+        # Passos para voltar à lista de conversas depois de uma falha
+        self.recovery = Recovery(
+            [('back', self._recover_back),
+             ('reset', self._recover_reset),
+             ('reload', self._recover_reload),
+             ('restart', self._recover_restart)],
+            healthy=self._is_healthy,
+            should_stop=lambda: self.window_signal,
+            timings=self.timings)
 
     def start(self):
-        # Sempre começa em headless, exceto se forçado a ser visível
-        if self.force_visible:
-            try:
-                self.driver.quit()
-            except Exception:
-                self.log_error('Error quitting headless driver')
-                return
-
-            self.options = Options()
-            self.options.add_argument(
-                r'user-data-dir={}'.format(PROFILE_WHATSAPP_PATH)
-            )
+        # Decide pelo perfil se vai precisar do QR Code antes de abrir o
+        # Chrome: nesse caso já abre visível, sem o headless antes
+        with self.timings.measure('startup.preflight'):
+            login_needed = whatsapp_login_state(self.profile) == LOGIN_NEEDED
+        if login_needed and not self.force_visible:
+            self.log_success('Login needed - opening visible browser')
+            self._show_login_message("WhatsApp Web")
 
-            try:
-                # Selenium irá buscar o chromedriver automaticamente no PATH
-                self.driver = webdriver.Chrome(options=self.options)
-            except WebDriverException as e:
-                print('webdriver', e.__class__.__name__)
-                if os.path.exists(PROFILE_WHATSAPP_PATH):
-                    shutil.rmtree(PROFILE_WHATSAPP_PATH)
-                raise e
-        self.driver.get('https://web.whatsapp.com/')
+        # Começa em headless, exceto se forçado a ser visível ou sem login
+        self.options = self._build_options(
+            headless=not (self.force_visible or login_needed))
+        try:
+            # Selenium irá buscar o chromedriver automaticamente no PATH
+            with self.timings.measure('startup.launch'):
+                self.driver = self._acquire_driver()
+        except WebDriverException as e:
+            print('webdriver', e.__class__.__name__)
+            if self.force_visible and os.path.exists(self.profile):
+                shutil.rmtree(self.profile)
+            raise e
+        with self.timings.measure('startup.load'):
+            self.driver.get(f'{self.base_url}/')
         self.driver.maximize_window()
 
         self.current_datetime = datetime.datetime.now().strftime('%d/%m/%Y')
@@ -73,11 +258,12 @@ class Whatsapp(LogFileMixin):
         self.automatic_msg = [n.replace('\n', '') for n in self.automatic_msg]
         self.action = ActionChains(self.driver)
 
-        # Tenta login automático primeiro
-        login_success = self._check_login_status()
+        with self.timings.measure('startup.login'):
+            login_success = self._check_login_status()
 
-        if not login_success and not self.force_visible:
-            # Se precisa de login e estava em headless, reinicia visível
+        if not login_success and not (self.force_visible or login_needed):
+            # O perfil parecia logado mas a sessão expirou: reinicia visível
+            record_login_state(self.profile, False)
             self.log_success('Login needed - switching to visible mode')
             self._show_login_message("WhatsApp Web")
             self._restart_with_visible_browser()
@@ -86,9 +272,26 @@ class Whatsapp(LogFileMixin):
         if not login_success:
             # Se está em modo visível, faz login normal
             print(self.driver.current_url)
-            self._login_()
+            if not self._login_():
+                return
 
+        record_login_state(self.profile, True)
         self.active_start = True
+        self.ready.set()
+
+    def _acquire_driver(self):
+        driver = self.drivers.acquire(self.profile, self.options)
+        instrument(driver, self.commands if self.record_commands else None)
+        return driver
+
+    def _build_options(self, headless: bool) -> Options:
+        options = Options()
+        options.add_argument(
+            r'user-data-dir={}'.format(self.profile)
+        )
+        if headless:
+            options.add_argument(r'--headless')
+        return options
 
     def _check_login_status(self) -> bool:
         """
@@ -96,36 +299,25 @@ class Whatsapp(LogFileMixin):
         Retorna True se logado, False se precisa fazer login
         """
         try:
-            # Espera um pouco menos para não travar muito em headless
-            wait_short = WebDriverWait(self.driver, 60)
-            # Se encontrar o elemento principal do WhatsApp, está logado
-            wait_short.until(lambda x: x.find_element(By.ID, 'side'))
-            self.log_success('Already logged in')
-            print('Já está logado')
-            return True
+            # Espera o que aparecer primeiro: a lista de conversas (logado)
+            # ou o QR Code; o limite só vale se nenhum dos dois carregar
+            wait_short = WebDriverWait(self.driver, LOGIN_CHECK_TIMEOUT)
+            screen = wait_short.until(_login_screen)
         except TimeoutException:
-            # Se não encontrou, pode precisar de login
-            try:
-                # Verifica se há QR code (precisa de login)
-                qr_code = self.driver.find_element(
-                    By.XPATH, '//*/canvas'
-                )
-                if qr_code:
-                    self.log_success('QR Code detected - login needed')
-                    print('QR Code detectado - login necessário')
-                    return False
-                else:
-                    self.log_success('No QR Code found - assuming logged in')
-                    return True
-            except NoSuchElementException:
-                pass
-
             self.log_success('Login status unclear - assuming login needed')
             return False
         except Exception as e:
             self.log_error(f'Error checking login: {e.__class__.__name__}')
             return False
 
+        if screen == 'side':
+            self.log_success('Already logged in')
+            print('Já está logado')
+            return True
+        self.log_success('QR Code detected - login needed')
+        print('QR Code detectado - login necessário')
+        return False
+
     def _show_login_message(self, service_name: str):
         """
         Mostra mensagem informativa antes de abrir navegador para login
@@ -161,25 +353,20 @@ class Whatsapp(LogFileMixin):
         """
         Reinicia o driver em modo visível para permitir login
         """
-        try:
-            if self.driver:
-                self.driver.quit()
-        except Exception:
-            pass
-
-        # Remove o headless e reinicia
-        self.options = Options()
-        self.options.add_argument(
-            r'user-data-dir={}'.format(PROFILE_WHATSAPP_PATH))
+        # Remove o headless e reinicia (o pool fecha o headless antes)
+        self.options = self._build_options(headless=False)
 
         try:
-            self.driver = webdriver.Chrome(options=self.options)
-            self.driver.get('https://web.whatsapp.com/')
+            self.driver = self._acquire_driver()
+            self.driver.get(f'{self.base_url}/')
             self.driver.maximize_window()
 
             # Agora faz o login com navegador visível
-            self._login_()
+            if not self._login_():
+                return
+            record_login_state(self.profile, True)
             self.active_start = True
+            self.ready.set()
 
         except Exception as e:
             self.log_error(f'Error restarting browser: {e.__class__.__name__}')
@@ -191,11 +378,9 @@ class Whatsapp(LogFileMixin):
         """
         try:
             # Verifica se o elemento principal do WhatsApp existe
-            wait_longer = WebDriverWait(self.driver, 15)
-            wait_longer.until(lambda x: x.find_element(By.ID, 'side'))
-
-            # Espera um pouco mais para garantir que tudo carregou
-            time.sleep(3)
+            # e se a lista de conversas já foi carregada
+            self._wait_until('loaded', lambda x: x.find_elements(
+                By.CSS_SELECTOR, '#side #pane-side'))
 
             # Verifica se não está na tela de QR code
             try:
@@ -220,211 +405,287 @@ class Whatsapp(LogFileMixin):
             self.log_error(f'Error verifying WhatsApp: {e.__class__.__name__}')
             return False
 
-    def check_number(self, phone_number: str) -> None:
-
-        formatted_contact_number = self.number_phone_formatting(phone_number)
+    def check_number(self, phone_number: str) -> str:
+        """
+        Atende o pedido e retorna como ele terminou (ver _check_number)
+        """
+        # Detalhamento do tempo gasto em cada etapa deste contato
+        stopwatch = Stopwatch(self.timings, 'send.')
+        # Número do pedido em andamento, para o TRACER
+        self.current_phone = phone_number
+        outcome = 'error'
+        with self.commands.scope('order', phone_number) as commands:
+            try:
+                outcome = self._check_number(phone_number, stopwatch)
+            finally:
+                stopwatch.stop()
+                self.current_phone = None
+                TRACER.finish(phone_number, outcome)
+                self.log_success(f'{phone_number} latency: {stopwatch}')
+        if self.record_commands:
+            self.log_success(f'{phone_number} {commands}')
+        return outcome
+
+    def _check_number(self, phone_number: str, stopwatch: Stopwatch) -> str:
+        """
+        Retorna como o pedido terminou (sent, order_code_found, stopped...)
+        """
 
         # Verifica se a interface ainda está ativa
         if not self._verify_interface_active():
             self.log_error('Interface not active - stopping operations')
             print('Interface não está ativa - parando operações WhatsApp')
-            return
+            return 'stopped'
 
+        title = self._open_chat(phone_number)
+        stopwatch.lap('open')
+        if not title:
+            return 'unresolvable'
+
+        # Espera a conversa certa estar aberta e pronta para digitar
         try:
-            new_chat = None
-            for selector in SELECTORS_NEW_CHAT:
-                try:
-                    new_chat = self.wait.until(
-                        lambda x: x.find_element(By.XPATH, selector)
-                    )
-                    break
-                except Exception:
-                    continue
+            self._wait_until('chat_ready', lambda x: x.execute_script(
+                CHAT_OPENED_JS, [title]) == title and
+                x.find_elements(By.CSS_SELECTOR,
+                                '#main footer [contenteditable="true"]'))
+        except TimeoutException:
+            self.log_error(f'{phone_number} chat not ready - skipping')
+            return 'chat_not_ready'
+        finally:
+            stopwatch.lap('chat_ready')
+            TRACER.mark(phone_number, 'open')
 
-            if not new_chat:
-                self.log_error("Nova conversa button not found")
-                raise Exception("Nova conversa button not found")
+        # Se a checagem de mensagens estiver desabilitada, envia direto
+        if not self.check_messages:
+            self.log_success(f'{phone_number} message check disabled')
+            sent = self.send_msg()
+            stopwatch.lap('send')
+            self.log_success(f'{phone_number} message sent without check')
+            return 'sent' if sent else 'send_failed'
 
+        # Verifica se já existe mensagem com código do pedido
+        has_order_code = self._has_order_code_message()
+        stopwatch.lap('history')
+        TRACER.mark(phone_number, 'history')
+        self.log_success(f'{phone_number} order code result: {has_order_code}')
+
+        if has_order_code:
+            self.log_success(f'{phone_number} order code already found')
+            print('encontrou codigo do pedido')
+            return 'order_code_found'
+
+        # Se não encontrou código do pedido, envia mensagem
+        self.log_success(f'{phone_number} no order code found - sending msg')
+        print(f'Sending message to {phone_number}')
+        sent = self.send_msg()
+        stopwatch.lap('send')
+        self.log_success(f'{phone_number} message sent')
+        return 'sent' if sent else 'send_failed'
+
+    def _find(self, role: str):
+        """
+        Busca o elemento do papel pelo SelectorRegistry
+        """
+        return self.selectors.find(self.driver, role,
+                                   self.wait_timeouts['element'])
+
+    def _wait_until(self, stage: str, condition):
+        """
+        Espera condition com o limite configurado para stage
+        """
+        wait = WebDriverWait(self.driver, self.wait_timeouts[stage],
+                             poll_frequency=WAIT_POLL_SECONDS)
+        return wait.until(condition)
+
+    def _open_chat(self, phone_number: str) -> Optional[str]:
+        """
+        Abre a conversa do número pelo caminho configurado em open_mode e
+        registra quanto tempo levou. O caminho 'link' volta para a busca
+        quando não consegue confirmar a conversa. Retorna o título com que
+        o contato aparece, ou None se não abriu.
+        """
+        status = self.contacts.status(phone_number)
+        if status == UNRESOLVABLE:
+            self.log_error(f'{phone_number} recently not found - skipping')
+            return None
+
+        titles = self.contacts.titles(
+            phone_number, self._title_candidates(phone_number))
+        start = time.perf_counter()
+        # Um número que já falhou é revalidado só pelo link, sem a busca
+        # e sem recarregar a página
+        mode = 'link' if status == REVALIDATE else self.open_mode
+        title = None
+        if mode == 'link':
+            title = self._open_chat_link(phone_number, titles)
+            if title is None and status != REVALIDATE:
+                self.log_error(f'{phone_number} link open not confirmed '
+                               f'- falling back to search')
+                mode = 'search'
+        if mode == 'search':
+            title = self._open_chat_search(phone_number, titles)
+
+        elapsed = time.perf_counter() - start
+        self.timings.add(f'chat.open.{mode}', elapsed)
+        self.log_success(f'{phone_number} chat open via {mode}: '
+                         f'{title or "failed"} in {elapsed:.2f}s')
+        if title and title != NOT_ON_WHATSAPP:
+            self.contacts.resolved(phone_number, title)
+            return title
+
+        ttl = self.contacts.failed(phone_number)
+        self.log_error(f'{phone_number} unresolvable - '
+                       f'not retried for {ttl / 60:.0f} min')
+        return None
+
+    def _title_candidates(self, phone_number: str) -> list[str]:
+        """
+        Formatos em que o número pode aparecer no WhatsApp: sem o nono
+        dígito (contas antigas, o formato de sempre) e com ele. Números de
+        10 dígitos (fixos) só têm um formato.
+        """
+        digits = normalize_phone(phone_number)
+        if len(digits) == 10:
+            # O number_phone_formatting é para celulares e cortaria um dígito
+            return [f'+55 {digits[:2]} {digits[2:6]}-{digits[6:]}']
+        candidates = [self.number_phone_formatting(phone_number)]
+        if len(digits) == 11:
+            candidates.append(f'+55 {digits[:2]} {digits[2:7]}-{digits[7:]}')
+        return candidates
+
+    def _open_chat_link(self, phone_number: str,
+                        titles: list[str]) -> Optional[str]:
+        """
+        Abre a conversa pelo link de envio do próprio WhatsApp Web, sem
+        recarregar a página, e espera o cabeçalho da conversa mostrar um
+        dos títulos. Retorna o título, NOT_ON_WHATSAPP se o WhatsApp disse
+        que o número não existe e None se não deu para confirmar.
+        """
+        try:
+            self.driver.execute_script(OPEN_CHAT_JS, f'55{phone_number}')
+            result = self._wait_until('chat_link', lambda x: x.execute_script(
+                CHAT_OPENED_JS, titles))
+        except TimeoutException:
+            return None
+        except WebDriverException as e:
+            self.log_error(f'link open {e.__class__.__name__}')
+            return None
+
+        if result == NOT_ON_WHATSAPP:
+            self.log_error(f'{phone_number} is not on WhatsApp')
+            ActionChains(self.driver).send_keys(Keys.ESCAPE).perform()
+        return result
+
+    def _open_chat_search(self, phone_number: str,
+                          titles: list[str]) -> Optional[str]:
+        """
+        Abre a conversa pela busca de "Nova conversa". Retorna o título do
+        resultado clicado, ou None se não conseguiu (a tela já foi
+        restaurada)
+        """
+        try:
+            new_chat = self._find('new_chat')
             new_chat.click()
             self.log_success(f'{phone_number} new_chat clicked')
         except Exception as e:
             self.log_error(f'new_chat {e.__class__.__name__}')
             print('new_chat', e.__class__.__name__)
-            return
+            self._recover(f'new_chat {e.__class__.__name__}')
+            return None
 
         try:
-            search_bar = self.wait.until(
-                lambda x: x.find_element(By.XPATH, XPATH_SEARCH_BAR)
-            )
+            search_bar = self._find('search_bar')
             search_bar.send_keys(phone_number)
-            time.sleep(2)
             self.log_success(f'{phone_number} search_bar send_keys')
         except Exception as e:
             print('search_bar', e.__class__.__name__)
             self.log_error(f'search_bar {e.__class__.__name__}')
 
         try:
-            chat = self.wait.until(
-                lambda x: x.find_element(
-                    By.XPATH,
-                    f'//*[@title="{formatted_contact_number}"]'
+            # Os resultados chegam enquanto a busca digita; espera o do
+            # número aparecer e poder ser clicado
+            match = ' or '.join(f'@title="{title}"' for title in titles)
+            chat = self._wait_until(
+                'search', expected_conditions.element_to_be_clickable(
+                    (By.XPATH, f'//*[{match}]')
                 )
             )
-            time.sleep(1)
+            title = chat.get_attribute('title')
             chat.click()
-            self.log_success(
-                f'{formatted_contact_number} chat clicked for title')
+            self.log_success(f'{title} chat clicked for title')
             print('chat')
-        except ElementClickInterceptedException:
-            ...
-            # try:
-            #     chat = self.wait.until(
-            #         lambda x: x.find_element(
-            #             By.XPATH,
-            #             '//*[@id="app"]/div/div[3]/div/div[2]/div[1]/span/div/span/div/div[2]/div[3]/div[2]/div[1]/div/span'
-            #         )
-            #     )
-            #     time.sleep(1)
-            #     chat.click()
-            #     self.log_success(
-            #         f'{phone_number} chat clicked for absolute path')
-            # except Exception:
-            try:
-                back_button = self.wait.until(
-                    lambda x: x.find_element(
-                        By.XPATH,
-                        '//*[@data-icon="back-refreshed"]'
-                    )
-                )
-                back_button.click()
-            except Exception as e:
-                self.log_error(f'Back_button {e.__class__.__name__}')
-                self.driver.get('https://web.whatsapp.com/')
-                while True:
-                    try:
-                        print('Logged in', e.__class__.__name__)
-                        self.wait.until(
-                            lambda x: x.find_element(
-                                By.XPATH, '//*[@id="app"]')
-                        )
-                    except Exception as e:
-                        print('Logged in', e.__class__.__name__)
-                        break
-                    else:
-                        self.log.log_success('Logged in successfully.')
-                        break
-                return print(e.__class__.__name__, 'aria-label="voltar"')
-            else:
-                return
+        except ElementClickInterceptedException as e:
+            self._recover(f'chat {e.__class__.__name__}')
+            return None
         except TimeoutException as e:
-            try:
-                self.log_error(
-                    f'chat TimeoutException: {e.__class__.__name__}')
-                back_button = self.wait.until(
-                    lambda x: x.find_element(By.XPATH, XPATH_BACK_BUTTON)
-                )
-                back_button.click()
-            except Exception as e:
-                self.driver.get('https://web.whatsapp.com/')
-                self.log_error(f'Back_button {e.__class__.__name__}')
-                while True:
-                    try:
-                        print('Logged in', e.__class__.__name__)
-                        self.wait.until(
-                            lambda x: x.find_element(
-                                By.XPATH, '//*[@id="app"]')
-                        )
-                    except Exception as e:
-                        print('Logged in', e.__class__.__name__)
-                        break
-                    else:
-                        self.log.log_success('Logged in successfully.')
-                        break
-                return print(e.__class__.__name__, 'aria-label="voltar"')
-            else:
-                return
+            self.log_error(f'chat TimeoutException: {e.__class__.__name__}')
+            self._recover(f'chat {e.__class__.__name__}')
+            return None
         except Exception as e:
-            self.driver.refresh()
             self.log_error(f'chat {e.__class__.__name__}')
-            while True:
-                try:
-                    print('new chat', e.__class__.__name__)
-                    self.wait.until(
-                        lambda x: x.find_element(
-                            By.ID, 'side')
-                    )
-                except Exception:
-                    ...
-                else:
-                    self.log.log_success('Logged in successfully.')
-                    break
-            return print(e, 'aria-label="voltar"')
+            self._recover(f'chat {e.__class__.__name__}', 'reload')
+            return None
 
-        time.sleep(1)
+        return title
 
-        # Se a checagem de mensagens estiver desabilitada, envia direto
-        if not self.check_messages:
-            self.log_success(f'{phone_number} message check disabled')
-            self.send_msg()
-            self.log_success(f'{phone_number} message sent without check')
-            return
+    def _recover(self, reason: str, first_step: str = 'back') -> None:
+        """
+        Devolve o WhatsApp Web à lista de conversas depois de uma falha.
+        Levanta RecoveryFailed se nem reabrindo o navegador resolver.
+        """
+        try:
+            step, seconds = self.recovery.recover(first_step)
+        except RecoveryFailed as e:
+            self.log_error(f'Recovery after {reason} failed: {e}')
+            raise
+        self.log_success(f'Recovered after {reason} via {step} '
+                         f'in {seconds:.1f}s')
+
+    def _is_healthy(self) -> bool:
+        """
+        Lista de conversas visível, sem aviso nem "Nova conversa" aberto
+        """
+        try:
+            self._wait_until('recovery', lambda x: x.find_elements(
+                By.ID, 'side') and not x.find_elements(
+                    By.CSS_SELECTOR, '[data-animate-modal-popup="true"]')
+                and not x.find_elements(By.XPATH, XPATH_SEARCH_BAR))
+        except TimeoutException:
+            return False
+        return True
 
-        # Verifica se já existe mensagem com código do pedido
-        has_order_code = self._has_order_code_message()
-        self.log_success(f'{phone_number} order code result: {has_order_code}')
+    def _recover_back(self) -> None:
+        self.selectors.find(self.driver, 'back_button',
+                            self.wait_timeouts['recovery']).click()
 
-        if has_order_code:
-            self.log_success(f'{phone_number} order code already found')
-            print('encontrou codigo do pedido')
-            return
+    def _recover_reset(self) -> None:
+        # Fecha avisos, buscas e painéis abertos sem sair da página
+        ActionChains(self.driver).send_keys(Keys.ESCAPE).send_keys(
+            Keys.ESCAPE).perform()
 
-        # Se não encontrou código do pedido, envia mensagem
-        self.log_success(f'{phone_number} no order code found - sending msg')
-        print(f'Sending message to {phone_number}')
-        self.send_msg()
-        self.log_success(f'{phone_number} message sent')
+    def _recover_reload(self) -> None:
+        self.driver.get(f'{self.base_url}/')
+        self._wait_until('loaded', lambda x: x.find_elements(By.ID, 'side'))
+
+    def _recover_restart(self) -> None:
+        self.drivers.discard(self.profile, wait=True)
+        self.driver = self._acquire_driver()
+        self.wait = WebDriverWait(self.driver, 10)
+        self.action = ActionChains(self.driver)
+        self._recover_reload()
 
     def _has_order_code_message(self) -> bool:
         """
         Verifica se já existe uma mensagem com código do pedido no chat HOJE.
         Busca por mensagens que contenham 'Código do pedido' junto com
         'www.whatsmenu.com.br' ou o título da mensagem configurado,
-        mas apenas nas mensagens de hoje.
+        mas apenas nas mensagens de hoje. A busca roda dentro da página,
+        da mensagem mais nova para trás, e para no separador do dia.
         """
         try:
-            # Busca todas as mensagens no chat usando a classe copyable-area
-            messages = self.wait.until(lambda x: x.find_elements(
-                By.CLASS_NAME, 'copyable-area'
-            ))
-
-            self.log_success(f'Found {len(messages)} messages to check')
-            print(f'Debug: Found {len(messages)} messages')
-
-            # Verifica cada mensagem
-            for i, message in enumerate(messages):
-                message_text = message.text.strip()
-                print(f'Debug: Message {i+1}: {message_text[:100]}...')
-
-                # Verifica se a mensagem é de hoje
-                if 'HOJE' in message_text:
-                    print(f'Debug: Message {i+1} contains HOJE')
-                    # Pega apenas o texto a partir de "HOJE"
-                    hoje_index = message_text.find('HOJE')
-                    today_message = message_text[hoje_index:]
-
-                    # Verifica se contém código do pedido
-                    if 'Código do pedido' in today_message:
-                        print(f'Debug: Found order code in message {i+1}')
-                        # Verifica se é do whatsmenu ou do título configurado
-                        if ('www.whatsmenu.com.br' in today_message or
-                                self.msg_title in today_message):
-                            self.log_success('Order code message found today')
-                            print('Debug: Order code from expected source')
-                            return True
-
-            self.log_success('No order code message found today')
-            return False
-
+            result = self._wait_until('history', lambda x: x.execute_script(
+                ORDER_CODE_SCAN_JS, self.msg_title, ORDER_CODE_MARKER,
+                WHATSMENU_MESSAGE_URL))
         except TimeoutException:
             self.log_error('Timeout waiting for messages')
             return False
@@ -432,86 +693,97 @@ class Whatsapp(LogFileMixin):
             self.log_error(f'Error checking messages: {e.__class__.__name__}')
             return False
 
-    def send_msg(self):
+        if result['found']:
+            self.log_success(f'Order code message found today '
+                             f'({result["position"]} messages back, '
+                             f'{result["scanned"]} scanned)')
+            print('Debug: Order code from expected source')
+            return True
+
+        self.log_success(f'No order code message found today '
+                         f'({result["scanned"]} scanned)')
+        return False
+
+    def send_msg(self) -> bool:
+        """
+        Envia a mensagem automática na conversa aberta. Retorna True se
+        ela apareceu como enviada
+        """
         print("Debug: Starting send_msg")
+        if self.send_mode == 'bulk':
+            return self._send_bulk()
+
         try:
             for i, msg in enumerate(self.automatic_msg):
                 print(f"Debug: Sending message {i+1}: {msg}")
-                # Tenta encontrar a caixa de texto de mensagem
+                # Tenta todos os seletores da caixa de mensagem de uma vez
                 try:
-                    # Tenta diferentes seletores para a caixa de mensagem
-                    msg_box = None
-
-                    try:
-                        msg_box = self.wait.until(lambda x: x.find_element(
-                            By.XPATH,
-                            '//*[@aria-placeholder="Digite uma mensagem"]'
-                        ))
-                        print("Debug: Found message box using placeholder")
-                    except TimeoutException:
-                        pass
-
-                    if not msg_box:
-                        try:
-                            msg_box = self.wait.until(lambda x: x.find_element(
-                                By.XPATH,
-                                '//div[@contenteditable="true"]'
-                                '[@data-tab="10"]'
-                            ))
-                            print(
-                                "Debug: Found message box"
-                                " using contenteditable"
-                            )
-                        except TimeoutException:
-                            pass
-
-                    # Opção 2: div com role textbox
-                    if not msg_box:
-                        try:
-                            msg_box = self.wait.until(lambda x: x.find_element(
-                                By.XPATH,
-                                '//div[@role="textbox"]'
-                            ))
-                            print("Debug: Found box using role=textbox")
-                        except TimeoutException:
-                            pass
-
-                    # Opção 3: qualquer elemento contenteditable
-                    if not msg_box:
-                        msg_box = self.wait.until(lambda x: x.find_element(
-                            By.XPATH,
-                            '//*[@contenteditable="true"]'
-                        ))
-                        print("Debug: Found box using contenteditable=true")
-
+                    msg_box = self._find('message_box')
+                    print("Debug: Found message box using "
+                          f"{self.selectors.winner('message_box')}")
                 except TimeoutException:
                     print("Debug: Could not find message box")
                     self.log_error('Could not find message input box')
-                    return
+                    return False
 
                 # Limpa e envia a mensagem
                 print(f"Debug: Clicking message box and sending: {msg}")
+                sent_before = self.driver.execute_script(COUNT_OUTGOING_JS)
                 msg_box.click()
                 msg_box.clear()
                 msg_box.send_keys(msg)
+                TRACER.mark(self.current_phone, 'typed')
                 msg_box.send_keys(Keys.ENTER)
-                time.sleep(1)  # Pausa entre mensagens
+                # Espera o balão da mensagem aparecer antes da próxima
+                try:
+                    self._wait_until('bubble', lambda x: x.execute_script(
+                        COUNT_OUTGOING_JS) > sent_before)
+                except TimeoutException:
+                    self.log_error(f'Message {i+1} bubble not shown')
+                    continue
+                finally:
+                    TRACER.mark(self.current_phone, 'sent')
                 print(f"Debug: Message {i+1} sent successfully")
 
         except AttributeError as e:
             self.log_error(f'msg AttributeError: {e.__class__.__name__}')
             print(f"Debug: AttributeError: {e}")
-            return
+            return False
         except TimeoutException:
             self.log_error('msg TimeoutException: Could not find message box')
-            return
+            return False
         except Exception as e:
             self.log_error(f'msg Exception: {e.__class__.__name__}')
-            return
+            return False
         else:
-            time.sleep(1)
             self.log_success('msg sent successfully')
-            return
+            return True
+
+    def _send_bulk(self) -> bool:
+        """
+        Envia todas as linhas da mensagem automática como uma única
+        mensagem, inserindo o texto de uma vez e apertando Enter uma vez
+        """
+        text = '\n'.join(self.automatic_msg)
+        try:
+            msg_box = self._find('message_box')
+            sent_before = self.driver.execute_script(COUNT_OUTGOING_JS)
+            msg_box.click()
+            msg_box.clear()
+            method = insert_text(self.driver, msg_box, text)
+            TRACER.mark(self.current_phone, 'typed')
+            msg_box.send_keys(Keys.ENTER)
+            self._wait_until('bubble', lambda x: x.execute_script(
+                COUNT_OUTGOING_JS) > sent_before)
+            TRACER.mark(self.current_phone, 'sent')
+        except TimeoutException:
+            self.log_error('msg TimeoutException: message not sent')
+            return False
+        except Exception as e:
+            self.log_error(f'msg Exception: {e.__class__.__name__}')
+            return False
+        self.log_success(f'msg sent as one message via {method}')
+        return True
 
     def _login_(self):
         logged_in = False
@@ -565,6 +837,8 @@ class Whatsapp(LogFileMixin):
                 print('logged in')
                 logged_in = True
 
+        return logged_in
+
     def number_phone_formatting(self, phone_number: str):
 
         phone_number_list = ['+', '55', ' ']
@@ -584,7 +858,7 @@ class Whatsapp(LogFileMixin):
         return formatted_phone_number
 
     def close(self):
-        self.driver.quit()
+        # O navegador fica no DRIVERS para ser reaproveitado no próximo ON
         self.browser_window = False
         print('Whatsapp Processo finalizado com sucesso.')
 
@@ -1,78 +1,159 @@
-import datetime
+import queue
+import threading
 import time
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
+from urllib.parse import quote
 
-from selenium import webdriver
-from selenium.common.exceptions import TimeoutException
+import requests
+from selenium.common.exceptions import (JavascriptException,
+                                        TimeoutException, WebDriverException)
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.wait import WebDriverWait
 
-from utils import PROFILE_WHATSMENU_PATH
+from checked import CheckedStore
+from commands import CommandRecorder, instrument
+from drivers import DRIVERS, DriverPool
+from http_orders import (HttpOrderSource, OrdersUnavailable, SessionExpired,
+                         save_session)
+from metrics import Timings
+from network import NetworkOrderReader, enable_performance_log
+from orders import (CARDS_CONTAINER_SELECTOR, CARDS_SELECTOR,
+                    EXTRACT_CARDS_JS, INSTALL_OBSERVER_JS, WAIT_CHANGE_JS,
+                    CardScanner)
+from phone import PHONE_PATTERN
+from preflight import LOGIN_NEEDED, record_login_state, whatsmenu_login_state
+from scheduler import DelayScheduler
+from tracing import TRACER
+from utils import (PROFILE_WHATSMENU_PATH, SESSION_WHATSMENU_PATH,
+                   WHATSMENU_URL)
 
 if TYPE_CHECKING:
     from whatsapp import Whatsapp
 
+# Tempo máximo de cada long-poll; limita a demora para atender o OFF
+PUSH_WAIT_SECONDS = 5
+# Intervalo entre consultas no modo sem navegador
+HTTP_POLL_SECONDS = 1
+# Consultas seguidas sem os pedidos (404, 5xx) antes de usar o navegador
+HTTP_UNAVAILABLE_LIMIT = 5
+# Espera antes de tentar de novo colocar um pedido na fila cheia
+QUEUE_RETRY_SECONDS = 1
+# Limite para a página mostrar o painel ou o formulário de login
+LOGIN_CHECK_TIMEOUT = 8
+
+
+def _login_screen(driver):
+    """
+    Condição do WebDriverWait: 'dashboard' se logado, 'login' se pede login.
+    Basta o contêiner dos cards: logado sem pedidos o painel vem vazio, e
+    a leitura dos cards trata isso como "nenhum pedido".
+    """
+    if driver.find_elements(By.CSS_SELECTOR, CARDS_CONTAINER_SELECTOR):
+        return 'dashboard'
+    if driver.find_elements(By.XPATH, '//form[@class]'):
+        return 'login'
+    return False
+
 
 class Whatsmenu:
     def __init__(self, whatsapp: 'Whatsapp', force_visible: bool,
-                 wait_time: str):
+                 wait_time: str, extraction: str = 'script',
+                 detection: str = 'push', base_url: str = WHATSMENU_URL,
+                 source: str = 'browser', record_commands: bool = False,
+                 profile=PROFILE_WHATSMENU_PATH,
+                 session_path=SESSION_WHATSMENU_PATH,
+                 checked: Optional[CheckedStore] = None,
+                 drivers: Optional[DriverPool] = None):
         self.force_visible = force_visible
         self.whatsapp = whatsapp
         self.wait_time = wait_time
+        self.base_url = base_url
+        # Outro perfil, sessão e registro de atendidos permitem usar o
+        # painel de teste do standin.py sem tocar nos arquivos reais
+        self.profile = profile
+        self.session_path = session_path
+        # De onde vem o navegador; outro pool permite usar o FakeDriver
+        self.drivers = drivers if drivers is not None else DRIVERS
         self.window_signal = False
-        self.today = datetime.datetime.today().strftime('%d/%m/%Y')
-        self.options = Options()
-        self.options.add_argument(f'user-data-dir={PROFILE_WHATSMENU_PATH}')
-        self.options.add_argument(r'--headless')
-        self.options.add_argument(r'--disable-print-preview')
-        self.driver = webdriver.Chrome(options=self.options)
+        # 'script' lê todos os cards em uma chamada, 'elements' lê um a um e
+        # 'network' lê os pedidos das respostas de rede do painel
+        self.extraction = extraction
+        # 'push' espera mudanças no painel, 'poll' consulta a cada segundo
+        self.detection = detection
+        # 'http' consulta os pedidos sem navegador usando a sessão salva e
+        # só abre o Chrome se a sessão não existir ou expirar
+        self.source = source
+        self.network_reader = NetworkOrderReader()
+        # Mede cada comando do WebDriver, somado por leitura do painel
+        self.record_commands = record_commands
+        self.commands = CommandRecorder()
+        # O Chrome só é aberto (ou reaproveitado) no start
+        self.driver = None
+        # Sinaliza que o painel está logado e sendo lido
+        self.ready = threading.Event()
+        self.timings = Timings()
         self.logged_in = False
-        try:
-            with open('list_checked.txt', 'r', encoding='utf8') as file:
-                self.list_of_checked = file.readlines()
-                self.list_of_checked = [
-                    n.replace('\n', '') for n in self.list_of_checked]
-        except Exception:
-            print('nao leu list_checked.txt')
-            with open('list_checked.txt', 'w', encoding='utf8') as file:
-                file.write(f'{self.today}\n')
-                self.list_of_checked = [self.today]
-        else:
-            if self.today != self.list_of_checked[0]:
-                self.list_of_checked = [self.today]
-                with open('list_checked.txt', 'w', encoding='utf8') as file:
-                    file.write(f'{self.today}\n')
-            print(self.list_of_checked)
+        self.scanner = CardScanner()
+        self.delays = DelayScheduler()
+        # Fila do OrderPipeline; None envia direto nesta thread
+        self.orders: Optional[queue.Queue] = None
+        self.in_flight: set[str] = set()
+        self.checked = checked if checked is not None else CheckedStore()
+        print(f'{len(self.checked)} números já atendidos hoje')
+
+    @property
+    def login_url(self) -> str:
+        callback = quote(f'{self.base_url}/dashboard/request', safe='')
+        return f'{self.base_url}/auth/login?callbackUrl={callback}'
+
+    def _acquire_driver(self):
+        driver = self.drivers.acquire(self.profile, self.options)
+        instrument(driver, self.commands if self.record_commands else None)
+        return driver
+
+    def _build_options(self, headless: bool) -> Options:
+        options = Options()
+        options.add_argument(f'user-data-dir={self.profile}')
+        if headless:
+            options.add_argument(r'--headless')
+        options.add_argument(r'--disable-print-preview')
+        if self.extraction == 'network':
+            enable_performance_log(options)
+        return options
 
     def start(self):
-        # Sempre começa em headless, exceto se forçado a ser visível
-        if self.force_visible:
-            try:
-                self.driver.quit()
-            except Exception:
-                print('Erro ao fechar driver headless do Whatsmenu')
-                return
-            self.options = Options()
-            self.options.add_argument(
-                f'user-data-dir={PROFILE_WHATSMENU_PATH}')
-            self.options.add_argument(r'--disable-print-preview')
+        if self.source == 'http' and self._wait_http():
+            return
 
-            self.driver = webdriver.Chrome(options=self.options)
+        # Decide pela sessão salva se vai precisar de login antes de abrir
+        # o Chrome: nesse caso já abre visível, sem o headless antes
+        with self.timings.measure('startup.preflight'):
+            login_needed = (whatsmenu_login_state(
+                self.base_url, self.profile, self.session_path) ==
+                LOGIN_NEEDED)
+        if login_needed and not self.force_visible:
+            self._show_login_message("Whatsmenu")
+
+        # Começa em headless, exceto se forçado a ser visível ou sem login
+        self.options = self._build_options(
+            headless=not (self.force_visible or login_needed))
+        with self.timings.measure('startup.launch'):
+            self.driver = self._acquire_driver()
 
-        self.driver.get(
-            'https://next.whatsmenu.com.br/auth/login?callbackUrl=https%3A'
-            '%2F%2Fnext.whatsmenu.com.br%2Fdashboard%2Frequest')
+        with self.timings.measure('startup.load'):
+            self.driver.get(self.login_url)
         self.driver.maximize_window()
 
         self.wait = WebDriverWait(self.driver, 6)
         self.browser_window = True
 
-        # Tenta login automático primeiro
-        login_success = self._check_login_status()
+        with self.timings.measure('startup.login'):
+            login_success = self._check_login_status()
 
-        if not login_success and not self.force_visible:
-            # Se precisa de login e estava em headless, reinicia visível
+        if not login_success and not (self.force_visible or login_needed):
+            # A sessão parecia válida mas expirou: reinicia visível
+            record_login_state(self.profile, False)
             self._show_login_message("Whatsmenu")
             self._restart_with_visible_browser()
             return
@@ -81,42 +162,100 @@ class Whatsmenu:
             # Se está em modo visível, faz login normal
             self._login_()
 
-        self.window_signal = False
+        # O window_signal não é zerado aqui: com a inicialização em
+        # paralelo, um OFF durante o login precisa continuar valendo
         if self.logged_in:
+            record_login_state(self.profile, True)
+            self._save_session()
+            self.ready.set()
             self.wait_element()
 
+    def _wait_http(self) -> bool:
+        """
+        Consulta os pedidos só por HTTP. Retorna False quando não há sessão
+        salva, ela expirou ou o endpoint não entrega os pedidos, para o
+        start seguir pelo navegador. Só a sessão expirada marca o perfil
+        como deslogado.
+        """
+        source = HttpOrderSource.from_session(self.base_url,
+                                              self.session_path)
+        if source is None:
+            print('Sessão do Whatsmenu não encontrada - usando navegador')
+            return False
+
+        unavailable = 0
+        self.browser_window = True
+        self.logged_in = True
+        self.ready.set()
+        try:
+            while not self.window_signal:
+                if not self._verify_interface_active():
+                    print("Interface não está mais ativa - encerrando "
+                          "Whatsmenu")
+                    break
+
+                try:
+                    orders = source.fetch()
+                except SessionExpired as e:
+                    print(f'Sessão do Whatsmenu expirou ({e}) - '
+                          'usando navegador')
+                    record_login_state(self.profile, False)
+                    self.logged_in = False
+                    return False
+                except OrdersUnavailable as e:
+                    unavailable += 1
+                    print(f'http orders unavailable ({e})')
+                    if unavailable >= HTTP_UNAVAILABLE_LIMIT:
+                        print('Pedidos indisponíveis por HTTP - usando '
+                              'navegador')
+                        self.logged_in = False
+                        return False
+                except requests.RequestException as e:
+                    print('http orders', e.__class__.__name__)
+                else:
+                    unavailable = 0
+                    self._process_phone_numbers(
+                        self.scanner.scan_cards(orders))
+                time.sleep(HTTP_POLL_SECONDS)
+        finally:
+            source.close()
+        return True
+
+    def _save_session(self) -> None:
+        """
+        Salva os cookies da sessão logada para o modo sem navegador
+        """
+        try:
+            # Com o endpoint salvo a verificação de login antes de abrir o
+            # Chrome consulta o painel por HTTP
+            save_session(self.driver.get_cookies(),
+                         self.network_reader.find_url(self.driver),
+                         self.session_path)
+        except Exception as e:
+            print('save session', e.__class__.__name__)
+
     def _check_login_status(self) -> bool:
         """
         Verifica rapidamente se já está logado no Whatsmenu
         """
         try:
-            # Espera um pouco para a página carregar
-            time.sleep(3)
-
-            # Se encontrar o dashboard, está logado
-            wait_short = WebDriverWait(self.driver, 5)
-            wait_short.until(lambda x: x.find_elements(
-                By.CSS_SELECTOR, '#main > section > div'
-            ))
-            self.logged_in = True
-            print('Whatsmenu já está logado')
-            return True
+            # Espera o que aparecer primeiro: o painel (logado) ou o
+            # formulário de login; o limite só vale se nenhum carregar
+            wait_short = WebDriverWait(self.driver, LOGIN_CHECK_TIMEOUT)
+            screen = wait_short.until(_login_screen)
         except TimeoutException:
-            # Se não encontrou dashboard, verifica se está na tela de login
-            try:
-                login_form = self.driver.find_elements(
-                    By.XPATH, '//form[@class]'
-                )
-                if login_form:
-                    print('Whatsmenu precisa de login')
-                    return False
-            except Exception:
-                pass
             return False
         except Exception as e:
             print(f'Erro verificando login Whatsmenu: {e.__class__.__name__}')
             return False
 
+        if screen == 'dashboard':
+            self.logged_in = True
+            print('Whatsmenu já está logado')
+            return True
+        print('Whatsmenu precisa de login')
+        return False
+
     def _show_login_message(self, service_name: str):
         """
         Mostra mensagem informativa antes de abrir navegador para login
@@ -159,27 +298,19 @@ class Whatsmenu:
         """
         Reinicia o driver em modo visível para permitir login
         """
-        try:
-            if self.driver:
-                self.driver.quit()
-        except Exception:
-            pass
-
-        # Remove o headless e reinicia
-        self.options = Options()
-        self.options.add_argument(f'user-data-dir={PROFILE_WHATSMENU_PATH}')
-        self.options.add_argument(r'--disable-print-preview')
+        # Remove o headless e reinicia (o pool fecha o headless antes)
+        self.options = self._build_options(headless=False)
 
         try:
-            self.driver = webdriver.Chrome(options=self.options)
-            self.driver.get(
-                'https://next.whatsmenu.com.br/auth/login?callbackUrl=https%3A'
-                '%2F%2Fnext.whatsmenu.com.br%2Fdashboard%2Frequest')
+            self.driver = self._acquire_driver()
+            self.driver.get(self.login_url)
             self.driver.maximize_window()
             self.wait = WebDriverWait(self.driver, 6)
 
             # Agora faz o login com navegador visível
             self._login_()
+            if self.logged_in:
+                record_login_state(self.profile, True)
 
         except Exception as e:
             print(f'Erro reiniciando Whatsmenu: {e.__class__.__name__}')
@@ -243,9 +374,10 @@ class Whatsmenu:
                     time.sleep(1)
 
             try:
+                # O painel pode abrir sem nenhum pedido
                 self.wait.until(lambda x: x.find_elements(
                     By.CSS_SELECTOR,
-                    '#main > section > div'
+                    CARDS_CONTAINER_SELECTOR
                 ))
             except TimeoutException as e:
                 print('E-mail and password', e.__class__.__name__)
@@ -257,6 +389,15 @@ class Whatsmenu:
                 print('Logged in')
 
     def wait_element(self):
+        if self.detection == 'push' and self._install_observer():
+            print('Whatsmenu aguardando pedidos via MutationObserver')
+            if self._wait_push():
+                return
+            print('MutationObserver indisponível - voltando ao polling')
+
+        self._wait_poll()
+
+    def _wait_poll(self):
         while not self.window_signal:
             # Verifica se a interface ainda está ativa antes de continuar
             if not self._verify_interface_active():
@@ -265,46 +406,150 @@ class Whatsmenu:
 
             try:
                 time.sleep(1)
-                elements_list = self.wait.until(lambda x: x.find_elements(
-                    By.CSS_SELECTOR,
-                    '#main > section > div'
-                ))
-
-                print(self.list_of_checked)
-
-                # Capturing the number
-                for n in elements_list:
-                    print(n.text.split('\n'))
-                    for n2 in n.text.split('\n'):
-                        if '(' in n2 and ')' in n2:
-                            init = n2.index('(')
-                            end = init + 15
-                            phone_number = n2[init:end]
-                            phone_number_clean = ''.join(
-                                [i for i in phone_number if i.isdecimal()])
-                            if phone_number_clean in self.list_of_checked:
-                                # print(phone_number_clean)
-                                continue
-                            else:
-                                for _ in range(int(self.wait_time)):
-                                    time.sleep(1)
-                                try:
-                                    self.whatsapp.check_number(
-                                        phone_number_clean)
-                                except Exception as e:
-                                    print(f'Erro ao verificar número: {e}')
-                                finally:
-                                    self.list_of_checked.append(
-                                        phone_number_clean)
-                                    with open('list_checked.txt', 'a',
-                                              encoding='utf8') as file:
-                                        file.write(f'{phone_number_clean}\n')
+                with self.commands.scope('poll'):
+                    self._process_phone_numbers(self._read_phone_numbers())
+            except TimeoutException as e:
+                # Uma leitura lenta não encerra a espera por pedidos
+                print('wait_element', e.__class__.__name__)
             except Exception as e:
                 print('wait_element', e.__class__.__name__)
                 return
 
+    def _wait_push(self) -> bool:
+        """
+        Bloqueia no navegador até o painel mudar, sem polling.
+        Retorna False se o observer deixou de funcionar e é preciso
+        voltar para o polling.
+        """
+        self.driver.set_script_timeout(PUSH_WAIT_SECONDS + 10)
+        while not self.window_signal:
+            if not self._verify_interface_active():
+                print("Interface não está mais ativa - encerrando Whatsmenu")
+                break
+
+            # Acorda a tempo de atender o próximo pedido agendado
+            timeout = PUSH_WAIT_SECONDS
+            next_due = self.delays.next_due_in()
+            if next_due is not None:
+                timeout = min(timeout, next_due)
+
+            try:
+                result = self.driver.execute_async_script(
+                    WAIT_CHANGE_JS, int(timeout * 1000)
+                )
+            except WebDriverException as e:
+                print('wait_push', e.__class__.__name__)
+                return False
+
+            try:
+                if result == 'detached' and not self._install_observer():
+                    return False
+                if result == 'timeout':
+                    self._send_due()
+                    continue
+                with self.commands.scope('poll'):
+                    self._process_phone_numbers(self._read_phone_numbers())
+            except TimeoutException as e:
+                # Uma leitura lenta não encerra a espera por pedidos
+                print('wait_element', e.__class__.__name__)
+            except Exception as e:
+                print('wait_element', e.__class__.__name__)
+                return True
+        return True
+
+    def _install_observer(self) -> bool:
+        try:
+            return bool(self.driver.execute_script(
+                INSTALL_OBSERVER_JS, CARDS_CONTAINER_SELECTOR
+            ))
+        except WebDriverException as e:
+            print('install observer', e.__class__.__name__)
+            return False
+
+    def _process_phone_numbers(self, phone_numbers: list[str]) -> None:
+        # Capturing the number
+        for phone_number_clean in phone_numbers:
+            if (phone_number_clean in self.checked or
+                    phone_number_clean in self.in_flight):
+                continue
+            # O tempo de espera conta a partir de quando o pedido apareceu
+            if self.delays.schedule(phone_number_clean, int(self.wait_time)):
+                TRACER.seen(phone_number_clean)
+
+        if self.scanner.last_parsed:
+            print(f'Cards: {self.scanner.last_parsed} lidos, '
+                  f'{self.scanner.last_skipped} ignorados')
+
+        self._send_due()
+
+    def _send_due(self) -> None:
+        """
+        Envia para os pedidos cujo tempo de espera já terminou. Com a fila
+        do OrderPipeline ligada, só entrega os números para a fila.
+        """
+        for phone_number_clean in self.delays.pop_due():
+            TRACER.mark(phone_number_clean, 'grace')
+            if self.orders is not None:
+                self._enqueue(phone_number_clean)
+                continue
+            outcome = 'error'
+            try:
+                outcome = self.whatsapp.check_number(phone_number_clean)
+            except Exception as e:
+                print(f'Erro ao verificar número: {e}')
+            finally:
+                # Parado pelo OFF: fica para o próximo ON
+                if outcome != 'stopped':
+                    self.mark_checked(phone_number_clean)
+
+    def _enqueue(self, phone_number_clean: str) -> None:
+        # Marca antes de colocar na fila: o envio pode atender e chamar o
+        # mark_checked antes do put_nowait retornar
+        self.in_flight.add(phone_number_clean)
+        try:
+            self.orders.put_nowait(phone_number_clean)
+        except queue.Full:
+            # Fila cheia: o número volta para a espera e o painel continua
+            # sendo lido enquanto o envio alcança
+            self.in_flight.discard(phone_number_clean)
+            self.delays.schedule(phone_number_clean, QUEUE_RETRY_SECONDS)
+
+    def mark_checked(self, phone_number_clean: str) -> None:
+        """
+        Registra o número como atendido. Chamado pela etapa de envio, que
+        pode estar em outra thread.
+        """
+        self.checked.add(phone_number_clean)
+        self.in_flight.discard(phone_number_clean)
+
+    def _read_phone_numbers(self) -> list[str]:
+        """
+        Lê os telefones dos cards do painel conforme o modo de extração
+        """
+        if self.extraction == 'network':
+            return self.scanner.scan_cards(
+                self.network_reader.read(self.driver, self.checked))
+
+        # Painel sem pedidos é uma leitura válida: lê uma vez, sem esperar
+        # aparecer algum card
+        if self.extraction == 'script':
+            try:
+                cards = self.driver.execute_script(
+                    EXTRACT_CARDS_JS, CARDS_SELECTOR, PHONE_PATTERN
+                )
+                return self.scanner.scan_cards(cards or [])
+            except JavascriptException as e:
+                # Sem suporte ao script, volta para a leitura por elementos
+                print('extract cards script', e.__class__.__name__)
+                self.extraction = 'elements'
+
+        elements_list = self.driver.find_elements(By.CSS_SELECTOR,
+                                                  CARDS_SELECTOR)
+        return self.scanner.scan(elements_list)
+
     def close(self):
-        self.driver.quit()
+        # O navegador fica no DRIVERS para ser reaproveitado no próximo ON
+        self.checked.close()
         self.browser_window = False
         print('Processo finalizado com sucesso.')
 